@@ -0,0 +1,232 @@
+from typing import Optional, BinaryIO, Iterator
+from contextlib import contextmanager
+import zipfile
+import struct
+import copy
+import re
+import io
+import os
+
+
+class PRPArchive:
+    """
+    Access to PRP files packed into ZIP archives of the game.
+    Members are addressed as 'archive.zip:path/LEVEL.PRP'
+    """
+    PRP_EXTENSION: str = ".prp"
+    ARCHIVE_PATH_PATTERN = re.compile(r'^(.+?\.zip):(.+)$', re.IGNORECASE)
+    COPY_CHUNK_SIZE: int = 1024 * 1024
+
+    LOCAL_HEADER_SIZE: int = 30
+    LOCAL_HEADER_SIGNATURE: bytes = b'PK\x03\x04'
+    DATA_DESCRIPTOR_SIGNATURE: bytes = b'PK\x07\x08'
+    CENTRAL_HEADER_SIGNATURE: bytes = b'PK\x01\x02'
+    CENTRAL_HEADER_FORMAT: str = '<4s4B4HL2L5H2L'
+    ZIP64_EXTRA_ID: int = 0x0001
+    ZIP64_LIMIT: int = 0xFFFFFFFF
+    ZIP64_VERSION: int = 45
+
+    @staticmethod
+    def split_path(path: str) -> Optional[tuple]:
+        """
+        Splits 'archive.zip:path/LEVEL.PRP' into archive path and member name. Returns None for plain paths
+        """
+        match = PRPArchive.ARCHIVE_PATH_PATTERN.match(path)
+        if match is None:
+            return None
+        return match.group(1), match.group(2).replace('\\', '/')
+
+    @staticmethod
+    def is_archive(path: str) -> bool:
+        return path.lower().endswith(".zip") and os.path.isfile(path)
+
+    @staticmethod
+    def folder_path(folder: str, member_name: str) -> Optional[str]:
+        """
+        Returns path of member inside of folder (same relative path), or None when member name escapes folder
+        (absolute names, '..' parts, links to outside)
+        """
+        path: str = os.path.normpath(os.path.join(folder, member_name.replace('\\', '/')))
+        real_folder: str = os.path.realpath(folder)
+        if os.path.commonpath([real_folder, os.path.realpath(path)]) != real_folder:
+            return None
+        return path
+
+    @staticmethod
+    def list_prps(archive_path: str) -> [str]:
+        with zipfile.ZipFile(archive_path, "r") as archive:
+            return [x.filename for x in archive.infolist()
+                    if not x.is_dir() and x.filename.lower().endswith(PRPArchive.PRP_EXTENSION)]
+
+    @staticmethod
+    @contextmanager
+    def open_member(path: str) -> Iterator[BinaryIO]:
+        """
+        Opens member of archive as decompressing stream, nothing is extracted to disk
+        """
+        archive_path, member_name = PRPArchive.split_path(path)
+        with zipfile.ZipFile(archive_path, "r") as archive:
+            with archive.open(member_name, "r") as member_stream:
+                yield member_stream
+
+    @staticmethod
+    def member_size(path: str) -> int:
+        """
+        Returns uncompressed size of member, only central directory of archive is read
+        """
+        archive_path, member_name = PRPArchive.split_path(path)
+        with zipfile.ZipFile(archive_path, "r") as archive:
+            return archive.getinfo(member_name).file_size
+
+    @staticmethod
+    def replace_members(archive_path: str, members: {str: bytes}):
+        """
+        Rewrites archive with new contents of given members (new members are appended).
+        Other members are copied as raw compressed data without recompression.
+        Result is written next to archive, checked and swapped in when complete.
+        """
+        tmp_path: str = f"{archive_path}.{os.getpid()}.tmp"
+        try:
+            with zipfile.ZipFile(archive_path, "r") as source, open(archive_path, "rb") as source_file:
+                pending: {str: bytes} = dict(members)
+
+                # Replaced and new members are compressed in memory by zipfile and then copied like other members
+                compressed_buffer: io.BytesIO = io.BytesIO()
+                with zipfile.ZipFile(compressed_buffer, "w") as compressed:
+                    for member_info in source.infolist():
+                        if member_info.filename in pending:
+                            replaced_info: zipfile.ZipInfo = copy.copy(member_info)
+                            replaced_info.flag_bits &= ~0x08
+                            compressed.writestr(replaced_info, pending.pop(member_info.filename), member_info.compress_type)
+                    for member_name, member_data in pending.items():
+                        compressed.writestr(member_name, member_data, zipfile.ZIP_DEFLATED)
+                    compressed_infos: {str: zipfile.ZipInfo} = {x.filename: x for x in compressed.infolist()}
+
+                # Every entry is (file with local header, its info, offset of local header in result)
+                entries: [(BinaryIO, zipfile.ZipInfo, int)] = []
+                with open(tmp_path, "wb") as destination:
+                    for member_info in source.infolist():
+                        if member_info.filename in compressed_infos:
+                            entry_file, entry_info = compressed_buffer, compressed_infos.pop(member_info.filename)
+                        else:
+                            entry_file, entry_info = source_file, member_info
+                        entries.append((entry_file, entry_info, destination.tell()))
+                        PRPArchive._copy_local_entry(entry_file, entry_info, destination)
+
+                    for entry_info in compressed_infos.values():
+                        entries.append((compressed_buffer, entry_info, destination.tell()))
+                        PRPArchive._copy_local_entry(compressed_buffer, entry_info, destination)
+
+                    PRPArchive._write_central_directory(destination, [(x[1], x[2]) for x in entries], source.comment)
+
+            PRPArchive._check_entries(tmp_path, [x[1] for x in entries])
+            os.replace(tmp_path, archive_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @staticmethod
+    def _copy_local_entry(source: BinaryIO, member_info: zipfile.ZipInfo, destination: BinaryIO):
+        """
+        Copies local header, compressed data and data descriptor of member byte to byte
+        """
+        source.seek(member_info.header_offset)
+        local_header: bytes = source.read(PRPArchive.LOCAL_HEADER_SIZE)
+        if len(local_header) != PRPArchive.LOCAL_HEADER_SIZE or local_header[:4] != PRPArchive.LOCAL_HEADER_SIGNATURE:
+            raise zipfile.BadZipFile(f"Bad local header of member {member_info.filename}")
+
+        name_length, extra_length = struct.unpack('<HH', local_header[26:30])
+        local_extra: bytes = source.read(name_length + extra_length)[name_length:]
+        remaining: int = PRPArchive.LOCAL_HEADER_SIZE + name_length + extra_length + member_info.compress_size
+
+        if member_info.flag_bits & 0x08:
+            # Data descriptor: optional signature, CRC and both sizes (8 bytes each for ZIP64 members)
+            source.seek(member_info.header_offset + remaining)
+            has_signature: bool = source.read(4) == PRPArchive.DATA_DESCRIPTOR_SIGNATURE
+            sizes_length: int = 16 if PRPArchive._find_extra(local_extra, PRPArchive.ZIP64_EXTRA_ID) is not None else 8
+            remaining += (4 if has_signature else 0) + 4 + sizes_length
+
+        source.seek(member_info.header_offset)
+        while remaining > 0:
+            chunk: bytes = source.read(min(remaining, PRPArchive.COPY_CHUNK_SIZE))
+            if not chunk:
+                raise zipfile.BadZipFile(f"Unexpected end of archive inside of member {member_info.filename}")
+            destination.write(chunk)
+            remaining -= len(chunk)
+
+    @staticmethod
+    def _write_central_directory(destination: BinaryIO, entries: [(zipfile.ZipInfo, int)], comment: bytes):
+        """
+        Writes central directory of copied entries (with ZIP64 records when they are needed) and end of archive
+        """
+        directory_offset: int = destination.tell()
+        for member_info, header_offset in entries:
+            zip64_values: [int] = [x for x in (member_info.file_size, member_info.compress_size, header_offset)
+                                   if x >= PRPArchive.ZIP64_LIMIT]
+            extra: bytes = PRPArchive._strip_extra(member_info.extra, PRPArchive.ZIP64_EXTRA_ID)
+            extract_version: int = member_info.extract_version
+            if zip64_values:
+                extra = struct.pack(f'<HH{len(zip64_values)}Q', PRPArchive.ZIP64_EXTRA_ID, 8 * len(zip64_values), *zip64_values) + extra
+                extract_version = max(extract_version, PRPArchive.ZIP64_VERSION)
+
+            date_time: tuple = member_info.date_time
+            dos_date: int = (date_time[0] - 1980) << 9 | date_time[1] << 5 | date_time[2]
+            dos_time: int = date_time[3] << 11 | date_time[4] << 5 | date_time[5] // 2
+            name: bytes = member_info.orig_filename.encode("utf-8" if member_info.flag_bits & 0x800 else "cp437")
+            destination.write(struct.pack(PRPArchive.CENTRAL_HEADER_FORMAT, PRPArchive.CENTRAL_HEADER_SIGNATURE,
+                                          member_info.create_version, member_info.create_system, extract_version,
+                                          member_info.reserved, member_info.flag_bits, member_info.compress_type,
+                                          dos_time, dos_date, member_info.CRC,
+                                          min(member_info.compress_size, PRPArchive.ZIP64_LIMIT),
+                                          min(member_info.file_size, PRPArchive.ZIP64_LIMIT),
+                                          len(name), len(extra), len(member_info.comment), 0,
+                                          member_info.internal_attr, member_info.external_attr,
+                                          min(header_offset, PRPArchive.ZIP64_LIMIT)))
+            destination.write(name)
+            destination.write(extra)
+            destination.write(member_info.comment)
+
+        directory_end: int = destination.tell()
+        directory_size: int = directory_end - directory_offset
+        if len(entries) >= 0xFFFF or directory_size >= PRPArchive.ZIP64_LIMIT or directory_offset >= PRPArchive.ZIP64_LIMIT:
+            destination.write(struct.pack('<4sQ2H2L4Q', b'PK\x06\x06', 44, PRPArchive.ZIP64_VERSION, PRPArchive.ZIP64_VERSION,
+                                          0, 0, len(entries), len(entries), directory_size, directory_offset))
+            destination.write(struct.pack('<4sLQL', b'PK\x06\x07', 0, directory_end, 1))
+
+        destination.write(struct.pack('<4s4H2LH', b'PK\x05\x06', 0, 0, min(len(entries), 0xFFFF), min(len(entries), 0xFFFF),
+                                      min(directory_size, PRPArchive.ZIP64_LIMIT), min(directory_offset, PRPArchive.ZIP64_LIMIT),
+                                      len(comment)))
+        destination.write(comment)
+
+    @staticmethod
+    def _check_entries(archive_path: str, expected_infos: [zipfile.ZipInfo]):
+        # Copied members must keep their compressed data, so sizes and CRC are compared with source
+        with zipfile.ZipFile(archive_path, "r") as archive:
+            written_infos: [zipfile.ZipInfo] = archive.infolist()
+        if len(written_infos) != len(expected_infos):
+            raise zipfile.BadZipFile(f"Archive has {len(written_infos)} members after rewrite, {len(expected_infos)} expected")
+        for written_info, expected_info in zip(written_infos, expected_infos):
+            if (written_info.filename, written_info.compress_size, written_info.CRC) != \
+                    (expected_info.filename, expected_info.compress_size, expected_info.CRC):
+                raise zipfile.BadZipFile(f"Member {expected_info.filename} was not copied correctly")
+
+    @staticmethod
+    def _find_extra(extra: bytes, header_id: int) -> Optional[bytes]:
+        offset: int = 0
+        while offset + 4 <= len(extra):
+            field_id, field_length = struct.unpack('<HH', extra[offset:offset + 4])
+            if field_id == header_id:
+                return extra[offset + 4:offset + 4 + field_length]
+            offset += 4 + field_length
+        return None
+
+    @staticmethod
+    def _strip_extra(extra: bytes, header_id: int) -> bytes:
+        stripped: bytes = b''
+        offset: int = 0
+        while offset + 4 <= len(extra):
+            field_id, field_length = struct.unpack('<HH', extra[offset:offset + 4])
+            if field_id != header_id:
+                stripped += extra[offset:offset + 4 + field_length]
+            offset += 4 + field_length
+        return stripped + extra[offset:]
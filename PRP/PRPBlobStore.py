@@ -0,0 +1,90 @@
+from typing import Optional
+import hashlib
+import mmap
+import os
+import re
+
+
+class PRPBlobStore:
+    """
+    Folder of RawData payloads named by SHA-1 of contents, so same payload is stored once for all instructions and files.
+    Payloads smaller than threshold stay in JSON, large blobs are memory-mapped when read back.
+    """
+    DEFAULT_THRESHOLD: int = 1024
+    MMAP_THRESHOLD: int = 1024 * 1024
+    BLOB_EXTENSION: str = ".bin"
+    DIGEST_PATTERN = re.compile(r"[0-9a-f]{40}")
+
+    def __init__(self, directory: str, threshold: int = DEFAULT_THRESHOLD):
+        self._directory: str = directory
+        self._threshold: int = threshold
+        self._stored: {str} = set()
+        self._loaded: {str: object} = {}
+
+    def __reduce__(self):
+        # Caches (and memory maps) are not shared with worker processes
+        return PRPBlobStore, (self._directory, self._threshold)
+
+    @property
+    def directory(self) -> str:
+        return self._directory
+
+    @property
+    def threshold(self) -> int:
+        return self._threshold
+
+    def path_of(self, digest: str) -> str:
+        if not isinstance(digest, str) or PRPBlobStore.DIGEST_PATTERN.fullmatch(digest) is None:
+            raise ValueError(f"Bad blob digest {digest!r}: 40 lowercase hex characters are expected")
+        return os.path.join(self._directory, f"{digest}{PRPBlobStore.BLOB_EXTENSION}")
+
+    def put(self, data: bytes) -> str:
+        """
+        Stores payload (when it's not stored yet) and returns its digest
+        """
+        digest: str = hashlib.sha1(data).hexdigest()
+        if digest in self._stored:
+            return digest
+
+        blob_path: str = self.path_of(digest)
+        if not os.path.isfile(blob_path):
+            os.makedirs(self._directory, exist_ok=True)
+            tmp_path: str = f"{blob_path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, "wb") as blob_file:
+                    blob_file.write(data)
+                os.replace(tmp_path, blob_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+        self._stored.add(digest)
+        return digest
+
+    def get(self, digest: str, length: Optional[int] = None):
+        """
+        Returns payload by digest: bytes or read-only memory map for large blobs. Every blob is read once.
+        Size of blob is checked against expected length, contents of blobs which are not memory-mapped against digest
+        """
+        data: Optional[object] = self._loaded.get(digest)
+        if data is not None:
+            return data
+
+        blob_path: str = self.path_of(digest)
+        if not os.path.isfile(blob_path):
+            raise FileNotFoundError(f"Blob {digest} is not found in {self._directory}")
+
+        with open(blob_path, "rb") as blob_file:
+            blob_size: int = os.fstat(blob_file.fileno()).st_size
+            if length is not None and blob_size != length:
+                raise ValueError(f"Blob {digest} has {blob_size} bytes, but {length} bytes are expected")
+
+            if blob_size >= PRPBlobStore.MMAP_THRESHOLD:
+                data = mmap.mmap(blob_file.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                data = blob_file.read()
+                if hashlib.sha1(data).hexdigest() != digest:
+                    raise ValueError(f"Blob {digest} is corrupted: its contents do not match digest")
+
+        self._loaded[digest] = data
+        return data
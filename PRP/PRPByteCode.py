@@ -1,6 +1,9 @@
-from PRP import PRPInstruction, PRPOpCode, PRPByteCodeContext, PRPBadInstructionError
-from typing import Optional
+from PRP import PRPInstruction, PRPOpCode, PRPByteCodeContext, PRPBadInstructionError, PRPStringCodec, PRPByteStream
+from PRP import PRPObjectShape, PRPShapeCache
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Iterator
 import struct
+import os
 
 
 class PRPByteCode:
@@ -9,24 +12,347 @@ class PRPByteCode:
     CF_READ_OBJECT:    int = 1 << 2
     CF_END_OF_STREAM:  int = 1 << 31
 
+    # Bytecode of this size or larger is decoded in process pool (0 - never, CLI enables it explicitly)
+    PARALLEL_THRESHOLD: int = 0
+    PARALLEL_CHUNKS_PER_WORKER: int = 4
+
+    _ARRAY_BYTES: bytes = bytes((PRPOpCode.Array.value, PRPOpCode.NamedArray.value))
+
+    # Size (with op-code byte) of instructions which do not depend on their contents
+    _OP_FIXED_SPANS: {PRPOpCode: int} = {
+        PRPOpCode.Array: 5, PRPOpCode.NamedArray: 5, PRPOpCode.Container: 5, PRPOpCode.NamedContainer: 5,
+        PRPOpCode.BeginObject: 1, PRPOpCode.BeginNamedObject: 1, PRPOpCode.EndObject: 1, PRPOpCode.EndArray: 1,
+        PRPOpCode.EndOfStream: 1, PRPOpCode.SkipMark: 1,
+        PRPOpCode.Char: 2, PRPOpCode.NamedChar: 2, PRPOpCode.Bool: 2, PRPOpCode.NamedBool: 2,
+        PRPOpCode.Int8: 2, PRPOpCode.NamedInt8: 2, PRPOpCode.Int16: 3, PRPOpCode.NamedInt16: 3,
+        PRPOpCode.Int32: 5, PRPOpCode.NamedInt32: 5, PRPOpCode.Float32: 5, PRPOpCode.NamedFloat32: 5,
+        PRPOpCode.Bitfield: 5, PRPOpCode.NameBitfield: 5, PRPOpCode.Float64: 9, PRPOpCode.NamedFloat64: 9
+    }
+
     def __init__(self, byte_code: bytes):
         self._vm_instructions: [PRPInstruction] = []
         self._vm_bytecode: bytes = byte_code
+        self._vm_view: memoryview = memoryview(byte_code)
+        self._vm_stream: Optional[PRPByteStream] = None
+
+    @staticmethod
+    def from_stream(byte_stream: PRPByteStream):
+        """
+        Creates bytecode which is decoded directly from stream, without buffering of whole bytecode in memory
+        """
+        byte_code: PRPByteCode = PRPByteCode(bytes())
+        byte_code._vm_stream = byte_stream
+        return byte_code
 
     @property
     def instructions(self) -> [PRPInstruction]:
         return self._vm_instructions
 
-    def prepare(self, vm_flags: int, vm_token_table: [str]) -> bool:
+    def prepare(self, vm_flags: int, vm_token_table: [str], shape_cache: Optional[PRPShapeCache] = None,
+                parallel_threshold: Optional[int] = None, max_workers: Optional[int] = None) -> bool:
+        """
+        Decodes whole bytecode. Objects with already seen layout are decoded in batch by shape cache
+        (new cache is used when it's not passed).
+        Bytecode larger than parallel_threshold (PARALLEL_THRESHOLD by default, 0 disables it) is decoded in process pool.
+        """
         self._vm_instructions = []
         vm_ctx: PRPByteCodeContext = PRPByteCodeContext(0)
 
+        if self._vm_stream is not None:
+            self._vm_instructions.extend(self.stream(vm_flags, vm_token_table, vm_ctx))
+            return vm_ctx.is_eof
+
+        parallel_threshold = parallel_threshold if parallel_threshold is not None else PRPByteCode.PARALLEL_THRESHOLD
+        if 0 < parallel_threshold <= len(self._vm_bytecode):
+            is_eof: Optional[bool] = self.prepare_parallel(vm_flags, vm_token_table, shape_cache, max_workers)
+            if is_eof is not None:
+                return is_eof
+
+        shape_cache = shape_cache if shape_cache is not None else PRPShapeCache()
         while vm_ctx.index < len(self._vm_bytecode):
-            self.prepare_op_code(vm_ctx, vm_flags, vm_token_table)
+            self.prepare_batched_op_code(vm_ctx, vm_flags, vm_token_table, shape_cache)
 
+        shape_cache.add_total(len(self._vm_instructions))
         return vm_ctx.is_eof
 
+    def prepare_parallel(self, vm_flags: int, vm_token_table: [str], shape_cache: Optional[PRPShapeCache] = None,
+                         max_workers: Optional[int] = None) -> Optional[bool]:
+        """
+        Splits bytecode by top-level objects into balanced chunks, decodes them in process pool and joins results in order.
+        Bytecode and token table are passed to every worker once, tasks are just ranges of chunks.
+        Returns None when bytecode could not be split (caller should decode it sequentially)
+        """
+        max_workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
+        if max_workers < 2:
+            return None
+
+        chunks: [(int, int)] = PRPByteCode.split_objects(self._vm_bytecode, vm_flags, max_workers * PRPByteCode.PARALLEL_CHUNKS_PER_WORKER)
+        if len(chunks) < 2:
+            return None
+
+        # Views of caller's buffer could not be shared with workers, so only this case costs a copy
+        vm_bytecode: bytes = self._vm_bytecode if isinstance(self._vm_bytecode, bytes) else bytes(self._vm_bytecode)
+        # Workers return op-codes as bytes and op-data as list, it's much cheaper to unpickle than instances
+        op_code_by_byte: {int: PRPOpCode} = {op_code.value: op_code for op_code in PRPOpCode}
+        is_eof: bool = False
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=PRPByteCode._init_worker,
+                                 initargs=(vm_bytecode, vm_flags, vm_token_table)) as pool:
+            for op_codes, op_datas, is_chunk_eof, statistics in pool.map(PRPByteCode._decode_chunk, chunks):
+                self._vm_instructions.extend(map(PRPInstruction, map(op_code_by_byte.__getitem__, op_codes), op_datas))
+                is_eof = is_eof or is_chunk_eof
+                if shape_cache is not None:
+                    shape_cache.merge(statistics)
+
+        return is_eof
+
+    @staticmethod
+    def split_objects(buffer: bytes, vm_flags: int, chunks_count: int) -> [(int, int)]:
+        """
+        Pre-scans bytecode without decoding and returns ranges of (almost) same size, split only between top-level objects
+        """
+        chunk_size: int = max(len(buffer) // max(chunks_count, 1), 1)
+        chunks: [(int, int)] = []
+        chunk_begin: int = 0
+
+        for _, object_end, _ in PRPByteCode.find_objects(buffer, vm_flags):
+            if object_end - chunk_begin >= chunk_size:
+                chunks.append((chunk_begin, object_end))
+                chunk_begin = object_end
+
+        if chunk_begin < len(buffer):
+            chunks.append((chunk_begin, len(buffer)))
+
+        return chunks
+
+    @staticmethod
+    def find_objects(buffer: bytes, vm_flags: int, max_count: Optional[int] = None) -> [(int, int, int)]:
+        """
+        Pre-scans bytecode without decoding and returns (begin offset, end offset, index of first instruction)
+        of every top-level object (from BeginObject to its EndObject). Scan stops after max_count objects when it's given
+        """
+        objects: [(int, int, int)] = []
+        object_begin: int = 0
+        object_instruction: int = 0
+        depth: int = 0
+        vm_index: int = 0
+        instruction_index: int = 0
+        buffer_size: int = len(buffer)
+        spans: [int] = PRPByteCode._byte_spans()
+        end_object_byte: int = PRPOpCode.EndObject.value
+        array_bytes: bytes = PRPByteCode._ARRAY_BYTES
+        object_bytes: bytes = bytes((*PRPShapeCache.BEGIN_OBJECT_BYTES, end_object_byte))
+
+        while vm_index < buffer_size:
+            op_byte: int = buffer[vm_index]
+            if op_byte in PRPShapeCache.BEGIN_OBJECT_BYTES:
+                if depth == 0:
+                    object_begin = vm_index
+                    object_instruction = instruction_index
+                depth += 1
+            elif op_byte == end_object_byte:
+                depth -= 1
+
+            op_span: int = spans[op_byte]
+            if op_span == 0:
+                op_span = PRPByteCode.op_span(buffer, vm_index, vm_flags)
+                if op_span > buffer_size - vm_index:
+                    break  # Broken tail, decoder will report it
+            vm_index += op_span
+            instruction_index += 1
+
+            if op_byte in array_bytes and vm_index < buffer_size:
+                # Skip run of array entries with same fixed-width op-code at once (like Float32 entries of matrix)
+                entries_count: int = int.from_bytes(buffer[vm_index - 4:vm_index], "little")
+                entry_byte: int = buffer[vm_index]
+                entry_span: int = spans[entry_byte]
+                run_end: int = vm_index + entry_span * entries_count
+                if entries_count > 1 and entry_span > 0 and entry_byte not in object_bytes and run_end <= buffer_size \
+                        and buffer[vm_index:run_end:entry_span] == bytes((entry_byte,)) * entries_count:
+                    vm_index = run_end
+                    instruction_index += entries_count
+
+            if depth == 0 and op_byte == end_object_byte:
+                objects.append((object_begin, vm_index, object_instruction))
+                if len(objects) == max_count:
+                    break
+            elif depth < 0:
+                depth = 0  # Unbalanced EndObject, decoder will report it
+
+        return objects
+
+    _BYTE_SPANS: Optional[list] = None
+
+    @staticmethod
+    def _byte_spans() -> [int]:
+        """
+        Returns fixed span of instruction for every op-code byte (0 when span depends on contents)
+        """
+        if PRPByteCode._BYTE_SPANS is None:
+            PRPByteCode._BYTE_SPANS = [PRPByteCode._OP_FIXED_SPANS.get(PRPOpCode.from_byte(x), 0) for x in range(256)]
+        return PRPByteCode._BYTE_SPANS
+
+    # Bytecode shared with worker process of parallel decoder: (bytecode, flags, token table)
+    _worker_state: Optional[tuple] = None
+
+    @staticmethod
+    def _init_worker(vm_bytecode: bytes, vm_flags: int, vm_token_table: [str]):
+        PRPByteCode._worker_state = (vm_bytecode, vm_flags, vm_token_table)
+
+    @staticmethod
+    def _decode_chunk(chunk: (int, int)) -> tuple:
+        vm_bytecode, vm_flags, vm_token_table = PRPByteCode._worker_state
+        shape_cache: PRPShapeCache = PRPShapeCache()
+        byte_code: PRPByteCode = PRPByteCode(vm_bytecode[chunk[0]:chunk[1]])
+        is_eof: bool = byte_code.prepare(vm_flags, vm_token_table, shape_cache, parallel_threshold=0)
+        op_codes: bytes = bytes([instruction.op_code.value for instruction in byte_code.instructions])
+        op_datas: list = [instruction.op_data for instruction in byte_code.instructions]
+        return op_codes, op_datas, is_eof, shape_cache.statistics()
+
+    def prepare_batched_op_code(self, vm_ctx: PRPByteCodeContext, vm_flags: int, vm_token_table: [str], shape_cache: PRPShapeCache):
+        """
+        Same as prepare_op_code, but whole object or run of array entries is decoded at once when it's possible
+        """
+        current_opcode_val = self._vm_bytecode[vm_ctx.index]
+        if current_opcode_val in PRPShapeCache.BEGIN_OBJECT_BYTES:
+            self.prepare_object(vm_ctx, vm_flags, vm_token_table, shape_cache)
+            return
+
+        self.prepare_op_code(vm_ctx, vm_flags, vm_token_table)
+        if current_opcode_val in PRPByteCode._ARRAY_BYTES and vm_ctx.index < len(self._vm_bytecode):
+            capacity: int = self._vm_instructions[-1].op_data['length']
+            if capacity > 1:
+                entries: Optional[list] = PRPObjectShape.decode_run(PRPOpCode.from_byte(self._vm_bytecode[vm_ctx.index]),
+                                                                    self._vm_bytecode, vm_ctx.index, capacity, vm_flags)
+                if entries is not None:
+                    self._vm_instructions.extend(entries)
+                    vm_ctx.set_index(vm_ctx.index + PRPByteCode._OP_FIXED_SPANS[entries[0].op_code] * capacity)
+                    shape_cache.add_batched(capacity)
+
+    def prepare_object(self, vm_ctx: PRPByteCodeContext, vm_flags: int, vm_token_table: [str], shape_cache: PRPShapeCache):
+        """
+        Decodes object which begins at current index (with all nested objects) and learns its shape
+        """
+        def decode_member(member_index: int) -> tuple:
+            vm_ctx.set_index(member_index)
+            return self.decode_op_code(vm_ctx, vm_flags, vm_token_table), vm_ctx.index
+
+        object_index: int = vm_ctx.index
+        batched: Optional[tuple] = shape_cache.decode_object(self._vm_bytecode, object_index, vm_flags, vm_token_table, decode_member)
+        vm_ctx.set_index(object_index)
+        if batched is not None:
+            self._vm_instructions.extend(batched[0])
+            vm_ctx.set_index(batched[1])
+            return
+
+        object_begin: int = len(self._vm_instructions)
+        self.prepare_op_code(vm_ctx, vm_flags, vm_token_table)
+        while vm_ctx.index < len(self._vm_bytecode):
+            is_end_of_object: bool = self._vm_bytecode[vm_ctx.index] == PRPOpCode.EndObject.value
+            self.prepare_batched_op_code(vm_ctx, vm_flags, vm_token_table, shape_cache)
+            if is_end_of_object:
+                break
+
+        shape_cache.learn(self._vm_instructions[object_begin:], vm_flags)
+
+    def stream(self, vm_flags: int, vm_token_table: [str], vm_ctx: Optional[PRPByteCodeContext] = None) -> Iterator[PRPInstruction]:
+        """
+        Decodes instructions one by one from byte stream and yields them without keeping in memory.
+        Only current instruction and refill buffer of stream are kept.
+        """
+        if self._vm_stream is None:
+            raise RuntimeError("Bytecode is not attached to stream. Use prepare() instead")
+
+        vm_ctx = vm_ctx if vm_ctx is not None else PRPByteCodeContext(0)
+        while self._vm_stream.ensure(1):
+            # Make sure that whole instruction is inside of buffer
+            op_span: int = PRPByteCode.op_span(self._vm_stream.buffer, self._vm_stream.position, vm_flags)
+            while op_span > self._vm_stream.available:
+                if not self._vm_stream.ensure(op_span):
+                    raise PRPBadInstructionError(f"Unexpected end of stream inside of instruction at {self._vm_stream.tell()}")
+                op_span = PRPByteCode.op_span(self._vm_stream.buffer, self._vm_stream.position, vm_flags)
+
+            if self._vm_bytecode is not self._vm_stream.buffer:
+                self._vm_bytecode = self._vm_stream.buffer
+                self._vm_view = memoryview(self._vm_bytecode)
+
+            op_begin: int = self._vm_stream.position
+            vm_ctx.set_index(op_begin)
+            instruction: Optional[PRPInstruction] = self.decode_op_code(vm_ctx, vm_flags, vm_token_table)
+            self._vm_stream.skip(vm_ctx.index - op_begin)
+
+            if instruction is not None:
+                yield instruction
+
+    @staticmethod
+    def op_span(buffer: bytes, offset: int, vm_flags: int) -> int:
+        """
+        Returns size of instruction which starts at offset without decoding it.
+        When buffer ends inside of instruction returns how many bytes (from offset) should be available
+        to continue, this value is always greater than available count of bytes.
+        """
+        available: int = len(buffer) - offset
+        if available < 1:
+            return 1
+
+        opcode: PRPOpCode = PRPOpCode.from_byte(buffer[offset])
+        span: int = PRPByteCode._OP_FIXED_SPANS.get(opcode, 0)
+        if span > 0:
+            return span
+
+        if opcode in [PRPOpCode.String, PRPOpCode.NamedString]:
+            return PRPByteCode._string_span(buffer, offset, 1, vm_flags)
+
+        if opcode in [PRPOpCode.RawData, PRPOpCode.NamedRawData]:
+            if available < 5:
+                return 5
+            return 5 + int.from_bytes(buffer[offset + 1:offset + 5], "little")
+
+        if opcode in [PRPOpCode.StringOrArray_E, PRPOpCode.StringOrArray_8E]:
+            if (vm_flags >> 2) & 1:
+                return PRPByteCode._string_span(buffer, offset, 1, vm_flags, False)
+            return 5
+
+        if opcode == PRPOpCode.StringArray:
+            if not (vm_flags >> 2) & 1:
+                return 5
+            if available < 5:
+                return 5
+
+            capacity: int = int.from_bytes(buffer[offset + 1:offset + 5], "little")
+            if (vm_flags >> 3) & 1:
+                return 5 + capacity * 4
+
+            span = 5
+            for si in range(0, capacity):
+                span = PRPByteCode._string_span(buffer, offset, span, vm_flags)
+                if span > available:
+                    return span
+            return span
+
+        # Bad or not implemented op-code, decoder will report it
+        return 1
+
+    @staticmethod
+    def _string_span(buffer: bytes, offset: int, span: int, vm_flags: int, is_terminated: bool = True) -> int:
+        """
+        Returns span of instruction (from offset) after string which starts at offset + span
+        """
+        if (vm_flags >> 3) & 1:
+            return span + 4
+
+        available: int = len(buffer) - offset
+        if available < span + 4:
+            return span + 4
+
+        length: int = int.from_bytes(buffer[offset + span:offset + span + 4], "little")
+        return span + 4 + length + (1 if is_terminated else 0)
+
     def prepare_op_code(self, vm_ctx: PRPByteCodeContext, vm_flags: int, vm_token_table: [str]):
+        current_opcode_vm_instruction: Optional[PRPInstruction] = self.decode_op_code(vm_ctx, vm_flags, vm_token_table)
+        if current_opcode_vm_instruction is not None:
+            self._vm_instructions.append(current_opcode_vm_instruction)
+
+    def decode_op_code(self, vm_ctx: PRPByteCodeContext, vm_flags: int, vm_token_table: [str]) -> Optional[PRPInstruction]:
         current_opcode_vm_instruction: Optional[PRPInstruction] = None
         current_opcode_vm_instruction_index: int = vm_ctx.index
         current_opcode_val = self._vm_bytecode[current_opcode_vm_instruction_index]
@@ -78,9 +404,7 @@ class PRPByteCode:
         elif current_opcode == PRPOpCode.StringArray:
             current_opcode_vm_instruction = self.prepare_op_code_string_array(current_opcode, vm_ctx, vm_flags, vm_token_table)
 
-        # --- SAVE INSTRUCTION ---
-        if current_opcode_vm_instruction is not None:
-            self._vm_instructions.append(current_opcode_vm_instruction)
+        return current_opcode_vm_instruction
 
     def prepare_op_code_array_or_named_array(self,
                                              vm_opcode: PRPOpCode,
@@ -117,7 +441,7 @@ class PRPByteCode:
         raise NotImplementedError(f"This op-code ({vm_opcode}) is not implemented yet")
 
     def prepare_op_code_char_or_named_char(self, vm_opcode: PRPOpCode, vm_ctx: PRPByteCodeContext) -> Optional[PRPInstruction]:
-        value: str = self._vm_bytecode[vm_ctx.index: vm_ctx.index + 1].decode("ascii")
+        value: str = str(self._vm_bytecode[vm_ctx.index: vm_ctx.index + 1], "ascii")
         vm_ctx += 1
         return PRPInstruction(vm_opcode, value)
 
@@ -164,7 +488,7 @@ class PRPByteCode:
         buffer: [] = []
         vm_ctx += 4
         if capacity > 0:
-            buffer = self._vm_bytecode[vm_ctx.index: vm_ctx.index + capacity]
+            buffer = bytes(self._vm_bytecode[vm_ctx.index: vm_ctx.index + capacity])  # Bytecode could be a view of caller's buffer
             vm_ctx += capacity
 
         return PRPInstruction(vm_opcode, {'length': capacity, 'data': buffer})
@@ -179,7 +503,7 @@ class PRPByteCode:
 
     def prepare_op_code_string_array_e_or_8e(self, vm_opcode: PRPOpCode, vm_ctx: PRPByteCodeContext, vm_flags: int, vm_token_table: [str]) -> Optional[PRPInstruction]:
         if (vm_flags >> 2) & 1:
-            result: str = self.exchange_string(vm_ctx, vm_flags, vm_token_table)
+            result: str = self.exchange_string(vm_ctx, vm_flags, vm_token_table, False)
             return PRPInstruction(vm_opcode, {'length': len(result), 'data': result})
         else:
             value: int = int.from_bytes(self._vm_bytecode[vm_ctx.index: vm_ctx.index + 4], "little")
@@ -188,23 +512,20 @@ class PRPByteCode:
 
     def prepare_op_code_string_array(self, vm_opcode: PRPOpCode, vm_ctx: PRPByteCodeContext, vm_flags: int, vm_token_table: [str]) -> Optional[PRPInstruction]:
         if (vm_flags >> 2) & 1:
-            if (vm_flags >> 3) & 1:
-                capacity: int = int.from_bytes(self._vm_bytecode[vm_ctx.index: vm_ctx.index + 4], "little")
-                vm_ctx += 4
-                result: [str] = []
+            capacity: int = int.from_bytes(self._vm_bytecode[vm_ctx.index: vm_ctx.index + 4], "little")
+            vm_ctx += 4
+            result: [str] = []
 
-                for si in range(0, capacity):
-                    result.append(self.exchange_string(vm_ctx, vm_flags, vm_token_table))
+            for si in range(0, capacity):
+                result.append(self.exchange_string(vm_ctx, vm_flags, vm_token_table))
 
-                return PRPInstruction(vm_opcode, result)
-            else:
-                raise NotImplementedError("This combination of options not implemented yet!")
+            return PRPInstruction(vm_opcode, result)
         else:
             value: int = int.from_bytes(self._vm_bytecode[vm_ctx.index: vm_ctx.index + 4], "little")
             vm_ctx += 4
             return PRPInstruction(vm_opcode, value)
 
-    def exchange_string(self, vm_ctx: PRPByteCodeContext, vm_flags: int, vm_token_table: [str]) -> str:
+    def exchange_string(self, vm_ctx: PRPByteCodeContext, vm_flags: int, vm_token_table: [str], is_terminated: bool = True) -> str:
         if (vm_flags >> 3) & 1:
             token_index: int = int.from_bytes(self._vm_bytecode[vm_ctx.index: vm_ctx.index + 4], "little")
             vm_ctx += 4
@@ -213,11 +534,6 @@ class PRPByteCode:
 
             return vm_token_table[token_index]
         else:
-            length: int = int.from_bytes(self._vm_bytecode[vm_ctx.index: vm_ctx.index + 4], "little")
-            vm_ctx += 4
-            if length <= 0:
-                raise PRPBadInstructionError(f"Got bad instruction at {vm_ctx.index - 4}")
-
-            raw_bytes: [] = self._vm_bytecode[vm_ctx.index: vm_ctx.index + length]
-            vm_ctx += length
-            return ''.join(raw_bytes)
+            result, next_index = PRPStringCodec.decode(self._vm_view, vm_ctx.index, is_terminated)
+            vm_ctx.set_index(next_index)
+            return result
@@ -0,0 +1,114 @@
+from PRP import PRPStructureError
+from typing import BinaryIO, Optional
+import re
+
+
+class PRPByteStream:
+    """
+    Reads data from any readable binary stream (file, pipe, socket, decompressor) through fixed-size refill buffer.
+    Never seeks, keeps in memory only unconsumed part of buffer.
+    """
+    DEFAULT_BUFFER_SIZE: int = 64 * 1024
+    # bytes.find() is not available for memoryview, but regular expressions work with any buffer
+    _TERMINATOR_PATTERN = re.compile(b'\x00')
+
+    def __init__(self, stream: BinaryIO, buffer_size: int = DEFAULT_BUFFER_SIZE, offset: int = 0):
+        """
+        Offset is position of stream begin inside of file (when stream was seeked before), it's used by tell() only
+        """
+        self._stream: Optional[BinaryIO] = stream
+        self._buffer_size: int = max(buffer_size, 0x10)
+        self._buffer: bytes = bytes()
+        self._position: int = 0  # Position inside of buffer
+        self._offset: int = offset  # Offset of buffer begin inside of stream
+        self._is_eof: bool = False
+
+    @staticmethod
+    def from_buffer(buffer, offset: int = 0):
+        """
+        Creates stream over data which is already in memory (bytes, bytearray, memoryview). Data is never copied:
+        everything is read as views of given buffer, so it should not be changed while stream is used
+        """
+        byte_stream: PRPByteStream = PRPByteStream(None, offset=offset)
+        byte_stream._buffer = memoryview(buffer).cast('B')
+        byte_stream._is_eof = True
+        return byte_stream
+
+    @property
+    def buffer(self) -> bytes:
+        return self._buffer
+
+    @property
+    def position(self) -> int:
+        return self._position
+
+    @property
+    def available(self) -> int:
+        return len(self._buffer) - self._position
+
+    def tell(self) -> int:
+        return self._offset + self._position
+
+    def ensure(self, count: int) -> bool:
+        """
+        Makes sure that at least count bytes are available in buffer from current position. Returns False at end of stream
+        """
+        if len(self._buffer) - self._position >= count:
+            return True
+
+        chunks: [bytes] = [self._buffer[self._position:]]
+        self._offset += self._position
+        self._position = 0
+        collected: int = len(chunks[0])
+
+        while collected < count and not self._is_eof:
+            chunk: bytes = self._stream.read(max(self._buffer_size, count - collected))
+            if not chunk:
+                self._is_eof = True
+                break
+            chunks.append(chunk)
+            collected += len(chunk)
+
+        self._buffer = b''.join(chunks)
+        return collected >= count
+
+    def read(self, count: int) -> bytes:
+        self.ensure(count)
+        result: bytes = self._buffer[self._position:self._position + count]
+        self._position += len(result)
+        return result
+
+    def skip(self, count: int):
+        if not self.ensure(count):
+            raise PRPStructureError(f"Unexpected end of stream (requested {count} bytes)", self.tell())
+        self._position += count
+
+    def read_cstring(self) -> str:
+        """
+        Reads zero terminated ASCII string
+        """
+        scanned: int = 0
+        while True:
+            terminator = PRPByteStream._TERMINATOR_PATTERN.search(self._buffer, self._position + scanned)
+            if terminator is not None:
+                result: str = str(self._buffer[self._position:terminator.start()], "ascii")
+                self._position = terminator.end()
+                return result
+
+            scanned = self.available
+            if not self.ensure(scanned + 1):
+                raise PRPStructureError("Unexpected end of stream inside of string", self.tell())
+
+    def read_rest(self) -> bytes:
+        """
+        Reads everything until end of stream
+        """
+        begin: int = self.tell()
+        result: bytes = self._buffer[self._position:]
+        if self._stream is not None:
+            result = result + self._stream.read()
+        self._buffer = bytes()
+        self._position = 0
+        self._offset = begin + len(result)
+        self._is_eof = True
+        return result
@@ -0,0 +1,231 @@
+from PRP import PRPReader, PRPInstruction, PRPOpCode
+from typing import Optional, BinaryIO
+import hashlib
+import json
+import os
+
+
+class _HashingStream:
+    """
+    Readable stream which hashes everything read through it
+    """
+
+    def __init__(self, stream: BinaryIO):
+        self._stream: BinaryIO = stream
+        self._hash = hashlib.sha1()
+
+    def read(self, size: int = -1) -> bytes:
+        chunk: bytes = self._stream.read(size)
+        self._hash.update(chunk)
+        return chunk
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+
+class PRPCorpusIndex:
+    """
+    Persisted index of corpus: per file partial aggregates (property names, op-codes and value ranges, ZDef types)
+    and their merge. Files are reprocessed only when their size, modification time and contents were changed.
+    Property is an object, its name is first string inside of object.
+    """
+    INDEX_VERSION: int = 1
+    UNNAMED_PROPERTY: str = "<unnamed>"
+    HASH_CHUNK_SIZE: int = 1024 * 1024
+
+    def __init__(self, index_path: str):
+        self._index_path: str = index_path
+        self._files: {str: dict} = {}
+        self._corpus: Optional[dict] = None
+
+    @property
+    def files(self) -> {str: dict}:
+        return self._files
+
+    @property
+    def corpus(self) -> dict:
+        """
+        Merged aggregates of all files
+        """
+        if self._corpus is None:
+            self._corpus = PRPCorpusIndex.merge({path: entry['partial'] for path, entry in self._files.items()})
+        return self._corpus
+
+    def load(self):
+        """
+        Loads index from disk, missing or outdated index is treated as empty
+        """
+        self._files = {}
+        self._corpus = None
+        if not os.path.isfile(self._index_path):
+            return
+
+        with open(self._index_path, "r") as index_file:
+            index_data: dict = json.load(index_file)
+        if index_data.get('version') == PRPCorpusIndex.INDEX_VERSION:
+            self._files = index_data['files']
+
+    def save(self):
+        tmp_path: str = f"{self._index_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as index_file:
+                json.dump({'version': PRPCorpusIndex.INDEX_VERSION, 'files': self._files, 'corpus': self.corpus}, index_file, indent=4)
+            os.replace(tmp_path, self._index_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def stale_files(self, paths: [str]) -> {str: Optional[str]}:
+        """
+        Forgets files which are not in paths and returns files with another size or modification time (or new ones).
+        Every file is mapped to SHA-1 of its known contents when size is same, analyze_file() compares contents then.
+        Nothing is read here, so hashing runs in workers together with analysis
+        """
+        for removed_path in set(self._files) - set(paths):
+            del self._files[removed_path]
+            self._corpus = None
+
+        stale: {str: Optional[str]} = {}
+        for path in paths:
+            entry: Optional[dict] = self._files.get(path)
+            if entry is None:
+                stale[path] = None
+                continue
+
+            size, mtime = PRPCorpusIndex.stat_of(path)
+            if not (entry['size'] == size and entry['mtime'] == mtime):
+                stale[path] = entry['sha1'] if entry['size'] == size else None
+
+        return stale
+
+    def update(self, path: str, entry: dict):
+        """
+        Stores result of analyze_file(), entry without partial aggregate (same contents) only refreshes modification time
+        """
+        if entry['partial'] is None:
+            self._files[path]['mtime'] = entry['mtime']
+            return
+
+        self._files[path] = entry
+        self._corpus = None
+
+    @staticmethod
+    def stat_of(path: str) -> (int, int):
+        file_stat: os.stat_result = os.stat(path)
+        return file_stat.st_size, file_stat.st_mtime_ns
+
+    @staticmethod
+    def hash_of(path: str) -> str:
+        file_hash = hashlib.sha1()
+        with open(path, "rb") as prp_file:
+            for chunk in iter(lambda: prp_file.read(PRPCorpusIndex.HASH_CHUNK_SIZE), b''):
+                file_hash.update(chunk)
+        return file_hash.hexdigest()
+
+    @staticmethod
+    def analyze_file(path: str, known_sha1: Optional[str] = None) -> dict:
+        """
+        Builds partial aggregate of file from stream of instructions (whole file is never kept in memory),
+        file is hashed while it's decoded. When contents still have known SHA-1, partial aggregate is None
+        """
+        size, mtime = PRPCorpusIndex.stat_of(path)
+        if known_sha1 is not None and PRPCorpusIndex.hash_of(path) == known_sha1:
+            return {'size': size, 'mtime': mtime, 'sha1': known_sha1, 'partial': None}
+
+        with open(path, "rb") as prp_file:
+            hashing_stream: _HashingStream = _HashingStream(prp_file)
+            prp_reader: PRPReader = PRPReader.from_stream(hashing_stream, size=size)
+            properties: {str: dict} = PRPCorpusIndex._analyze_instructions(prp_reader)
+
+            # Bytes after end of bytecode are not decoded, but they are part of contents
+            for _ in iter(lambda: hashing_stream.read(PRPCorpusIndex.HASH_CHUNK_SIZE), b''):
+                pass
+
+        definitions: {str: int} = {}
+        for prp_definition in prp_reader.definitions:
+            definitions[prp_definition.def_type.name] = definitions.get(prp_definition.def_type.name, 0) + 1
+
+        return {
+            'size': size,
+            'mtime': mtime,
+            'sha1': hashing_stream.hexdigest(),
+            'partial': {'definitions': definitions, 'properties': properties}
+        }
+
+    @staticmethod
+    def _analyze_instructions(prp_reader: PRPReader) -> {str: dict}:
+        properties: {str: dict} = {}
+        frames: [dict] = []
+
+        for instruction in prp_reader.iter_instructions():
+            op_code: PRPOpCode = instruction.op_code
+            if op_code == PRPOpCode.BeginObject or op_code == PRPOpCode.BeginNamedObject:
+                frames.append({'name': None, 'count': 1, 'op_codes': {}, 'ranges': {}})
+                continue
+
+            if len(frames) == 0:
+                continue  # Instructions outside of objects do not belong to any property
+
+            frame: dict = frames[-1]
+            if op_code == PRPOpCode.EndObject:
+                frames.pop()
+                PRPCorpusIndex._merge_property(properties, frame['name'] or PRPCorpusIndex.UNNAMED_PROPERTY, frame)
+                continue
+
+            op_name: str = op_code.name
+            frame['op_codes'][op_name] = frame['op_codes'].get(op_name, 0) + 1
+
+            if frame['name'] is None and op_code in [PRPOpCode.String, PRPOpCode.NamedString] and isinstance(instruction.op_data, dict):
+                frame['name'] = instruction.op_data['data']
+
+            value: Optional[float] = PRPCorpusIndex._numeric_value_of(instruction)
+            if value is not None:
+                PRPCorpusIndex._merge_range(frame['ranges'], op_name, [value, value])
+
+        return properties
+
+    @staticmethod
+    def merge(partials: {str: dict}) -> dict:
+        """
+        Merges partial aggregates of files: properties of whole corpus and files which use every ZDef type
+        """
+        properties: {str: dict} = {}
+        definitions: {str: dict} = {}
+        for path, partial in sorted(partials.items()):
+            for property_name, aggregate in partial['properties'].items():
+                PRPCorpusIndex._merge_property(properties, property_name, aggregate)
+                properties[property_name].setdefault('files', []).append(path)
+
+            for definition_type, count in partial['definitions'].items():
+                usage: dict = definitions.setdefault(definition_type, {'count': 0, 'files': []})
+                usage['count'] += count
+                usage['files'].append(path)
+
+        return {'files': len(partials), 'properties': properties, 'definitions': definitions}
+
+    @staticmethod
+    def _merge_property(properties: {str: dict}, property_name: str, aggregate: dict):
+        merged: dict = properties.setdefault(property_name, {'count': 0, 'op_codes': {}, 'ranges': {}})
+        merged['count'] += aggregate['count']
+        for op_name, count in aggregate['op_codes'].items():
+            merged['op_codes'][op_name] = merged['op_codes'].get(op_name, 0) + count
+        for op_name, value_range in aggregate['ranges'].items():
+            PRPCorpusIndex._merge_range(merged['ranges'], op_name, value_range)
+
+    @staticmethod
+    def _merge_range(ranges: {str: list}, op_name: str, value_range: list):
+        current: Optional[list] = ranges.get(op_name)
+        if current is None:
+            ranges[op_name] = list(value_range)
+        else:
+            current[0] = min(current[0], value_range[0])
+            current[1] = max(current[1], value_range[1])
+
+    @staticmethod
+    def _numeric_value_of(instruction: PRPInstruction) -> Optional[float]:
+        data = instruction.op_data
+        if isinstance(data, bool) or isinstance(data, int):
+            return int(data)
+        if isinstance(data, tuple) and len(data) == 1 and isinstance(data[0], float):
+            return data[0] if data[0] == data[0] else None  # NaN has no place in range
+        return None
@@ -1,5 +1,5 @@
-from PRP import PRPDefinitionType, PRPOpCode
-from typing import Any
+from PRP import PRPDefinitionType, PRPOpCode, PRPStringCodec
+from typing import Any, Optional
 import struct
 
 
@@ -12,7 +12,7 @@ class PRPDefinition:
     @staticmethod
     def from_json(json_definition):
         prp_def_name: str = json_definition['name']
-        prp_def_type: PRPDefinitionType = PRPDefinitionType[json_definition['type'].split('.')[1]]
+        prp_def_type: PRPDefinitionType = PRPDefinitionType.from_json(json_definition['type'])
         prp_def_data = json_definition['data']
 
         return PRPDefinition(prp_def_name, prp_def_type, prp_def_data)
@@ -32,11 +32,13 @@ class PRPDefinition:
     def def_data(self) -> Any:
         return self._def_data
 
-    def to_bytes(self, prp_flags: int, prp_symbols_table: [str]) -> bytes:
-        #TODO: Support packing of string by special flag in prp_flags
+    def to_bytes(self, prp_flags: int, prp_symbols_table: [str], prp_symbols_index: Optional[dict] = None) -> bytes:
+        """
+        Symbols index (string -> its index in symbols table) avoids linear search in symbols table when it's given
+        """
         res: bytes = bytes()
 
-        res += struct.pack('<ci', PRPOpCode.String.value.to_bytes(1, "little"), prp_symbols_table.index(self.def_name))
+        res += struct.pack('<ci', PRPOpCode.String.value.to_bytes(1, "little"), self._symbol_index(self.def_name, prp_symbols_table, prp_symbols_index))
         res += struct.pack('<ci', PRPOpCode.Int32.value.to_bytes(1, "little"), self.def_type.value)
 
         if self.def_type == PRPDefinitionType.Array_Int32 or self.def_type == PRPDefinitionType.Array_Float32:
@@ -54,12 +56,20 @@ class PRPDefinition:
             res += struct.pack('<c', PRPOpCode.EndArray.value.to_bytes(1, "little"))
         elif self.def_type in [PRPDefinitionType.StringRef_1, PRPDefinitionType.StringRef_2, PRPDefinitionType.StringRef_3]:
             # Write string tag and string index
-            res += struct.pack('<ci', PRPOpCode.String.value.to_bytes(1, "little"), prp_symbols_table.index(self.def_data))
+            res += struct.pack('<ci', PRPOpCode.String.value.to_bytes(1, "little"), self._symbol_index(self.def_data, prp_symbols_table, prp_symbols_index))
         elif self.def_type == PRPDefinitionType.StringRefTab:
             # 1. Write Op-Code Container
             res += struct.pack('<ci', PRPOpCode.Container.value.to_bytes(1, "little"), len(self.def_data))
             # 2. Write each entry
             for entry in self.def_data:
-                res += struct.pack('<ci', PRPOpCode.String.value.to_bytes(1, "little"), prp_symbols_table.index(entry))
+                if (prp_flags >> 3) & 1:
+                    res += struct.pack('<ci', PRPOpCode.String.value.to_bytes(1, "little"), self._symbol_index(entry, prp_symbols_table, prp_symbols_index))
+                else:
+                    res += struct.pack('<c', PRPOpCode.String.value.to_bytes(1, "little"))
+                    res += PRPStringCodec.encode(entry)
 
         return res
+
+    @staticmethod
+    def _symbol_index(symbol: str, prp_symbols_table: [str], prp_symbols_index: Optional[dict]) -> int:
+        return prp_symbols_index[symbol] if prp_symbols_index is not None else prp_symbols_table.index(symbol)
@@ -10,6 +10,19 @@ class PRPDefinitionType(IntEnum):
     StringRefTab = 0x11,
     ERR_UNKNOWN = 0xFFFF
 
+    def __str__(self):
+        # Python 3.11+ prints IntEnum as plain number, but JSON representation relies on 'PRPDefinitionType.Name'
+        return f"PRPDefinitionType.{self.name}"
+
+    @staticmethod
+    def from_json(value: str):
+        """
+        Accepts 'PRPDefinitionType.Name' and plain number (JSON produced by Python 3.11+ before this was fixed)
+        """
+        if value.isdigit():
+            return PRPDefinitionType(int(value))
+        return PRPDefinitionType[value.split('.')[1]]
+
     @staticmethod
     def from_byte(value: int):
         if value == 2:
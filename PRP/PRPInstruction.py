@@ -1,6 +1,7 @@
-from PRP import PRPOpCode
-from typing import Any
+from PRP import PRPOpCode, PRPStringCodec, PRPBlobStore
+from typing import Any, Optional
 import struct
+import mmap
 
 
 class PRPInstruction:
@@ -20,38 +21,55 @@ class PRPInstruction:
 
     op_data = property(_get_op_data, _set_op_data)
 
+    def __reduce__(self):
+        # Default pickling relies on __dict__ attribute which is overridden here by JSON view
+        return PRPInstruction, (self._op_code, self._op_data)
+
     @staticmethod
-    def from_json(json_property):
-        prp_op_code: PRPOpCode = PRPOpCode[json_property['op_code'].split('.')[1]]
+    def from_json(json_property, blob_store: Optional[PRPBlobStore] = None):
+        """
+        RawData could refer to payload of blob store ({'blob': digest, 'length': size}) instead of list of bytes
+        """
+        prp_op_code: PRPOpCode = PRPOpCode.from_json(json_property['op_code'])
         prp_op_data = json_property['op_data']
 
         if prp_op_data is None:
             prp_op_data = object()
 
         if prp_op_code == PRPOpCode.RawData or prp_op_code == PRPOpCode.NamedRawData:
-            prp_res_data = {
+            if isinstance(prp_op_data, dict):
+                if blob_store is None:
+                    raise ValueError(f"RawData refers to blob {prp_op_data['blob']}, but blob store is not given")
+                prp_op_data = blob_store.get(prp_op_data['blob'], prp_op_data.get('length'))
+
+            prp_op_data = {
                 'length': len(prp_op_data),
-                'data': bytes()
+                'data': prp_op_data if isinstance(prp_op_data, (bytes, mmap.mmap)) else bytes(prp_op_data)
             }
 
-            for prp_op_byte in prp_op_data:
-                prp_res_data['data'] += prp_op_byte.to_bytes(1, "little")
-
-            prp_op_data = prp_res_data
-
         return PRPInstruction(prp_op_code, prp_op_data)
 
-    def __dict__(self):
+    def __dict__(self, blob_store: Optional[PRPBlobStore] = None):
+        """
+        JSON view of instruction. RawData payloads not smaller than threshold of blob store are put into store
+        """
         res_data = self.op_data
         if self.op_code == PRPOpCode.RawData or self.op_code == PRPOpCode.NamedRawData:
-            res_data = [x for x in self.op_data['data']]
+            if blob_store is not None and len(self.op_data['data']) >= max(blob_store.threshold, 1):
+                res_data = {'blob': blob_store.put(self.op_data['data']), 'length': len(self.op_data['data'])}
+            else:
+                res_data = list(self.op_data['data'])
 
         return {
             'op_code': str(self.op_code),
             'op_data': res_data
         }
 
-    def to_bytes(self, flags: int, token_table: [str]) -> bytes:
+    def to_bytes(self, flags: int, token_table: Optional[list] = None, symbols_index: Optional[dict] = None) -> bytes:
+        """
+        Token table is used only when strings are indexed (bit 3 of flags), inline strings are written as is.
+        Symbols index (string -> its index in token table) avoids linear search in token table when it's given
+        """
         res: bytes = bytes()
         res += struct.pack('<c', self.op_code.value.to_bytes(1, "little"))
 
@@ -64,10 +82,12 @@ class PRPInstruction:
             raise NotImplementedError(f"This op-code ({opc}) is not implemented yet")
         elif opc in [PRPOpCode.BeginObject, PRPOpCode.BeginNamedObject, PRPOpCode.EndObject, PRPOpCode.SkipMark, PRPOpCode.EndOfStream, PRPOpCode.EndArray]:
             pass  # Just do nothing here
-        elif opc in [PRPOpCode.Char, PRPOpCode.NamedChar, PRPOpCode.Bool, PRPOpCode.NamedBool, PRPOpCode.Int8, PRPOpCode.NamedInt8]:
+        elif opc == PRPOpCode.Char or opc == PRPOpCode.NamedChar:
+            res += data.encode("ascii")
+        elif opc in [PRPOpCode.Bool, PRPOpCode.NamedBool, PRPOpCode.Int8, PRPOpCode.NamedInt8]:
             res += struct.pack('<c', data.to_bytes(1, "little"))
         elif opc == PRPOpCode.Int16 or opc == PRPOpCode.NamedInt16:
-            res += struct.pack('<h', data)
+            res += struct.pack('<H', data)  # Decoder reads Int16 unsigned, so 0x8000..0xFFFF should be written back as is
         elif opc in [PRPOpCode.Int32, PRPOpCode.NamedInt32, PRPOpCode.Bitfield, PRPOpCode.NameBitfield]:
             res += struct.pack('<I', data)  # Int should be unsigned to allow save 0xFFFFFFFF
         elif opc == PRPOpCode.Float32 or opc == PRPOpCode.NamedFloat32:
@@ -76,37 +96,33 @@ class PRPInstruction:
             res += struct.pack('<d', data[0])
         elif opc == PRPOpCode.String or opc == PRPOpCode.NamedString:
             if (flags >> 3) & 1:
-                res += struct.pack('<i', token_table.index(data['data']))
+                res += struct.pack('<i', PRPInstruction._symbol_index(data['data'], token_table, symbols_index))
             else:
-                res += struct.pack('<i', len(data['data']))
-                res += data['data'].encode("ascii")
-                res += b"\x00"
+                res += PRPStringCodec.encode(data['data'])
         elif opc == PRPOpCode.RawData or opc == PRPOpCode.NamedRawData:
             res += struct.pack('<i', data['length'])
             res += data['data']
         elif opc == PRPOpCode.StringArray:
             if (flags >> 2) & 1:
-                if (flags >> 3) & 1:
-                    res += struct.pack('<i', len(data))
-                    for entry in data:
-                        if (flags >> 3) & 1:
-                            res += struct.pack('<i', token_table.index(entry))
-                        else:
-                            res += struct.pack('<i', len(entry))
-                            res += entry.encode("ascii")
-                            res += b"\x00"
-                else:
-                    raise NotImplementedError("This combination of options not implemented yet [c1]!")
+                res += struct.pack('<i', len(data))
+                for entry in data:
+                    if (flags >> 3) & 1:
+                        res += struct.pack('<i', PRPInstruction._symbol_index(entry, token_table, symbols_index))
+                    else:
+                        res += PRPStringCodec.encode(entry)
             else:
-                res += struct.pack('<i', data)
+                res += struct.pack('<I', data)
         elif opc == PRPOpCode.StringOrArray_E or opc == PRPOpCode.StringOrArray_8E:
             if (flags >> 2) & 1:
                 if (flags >> 3) & 1:
-                    res += struct.pack('<i', token_table.index(data['data']))
+                    res += struct.pack('<i', PRPInstruction._symbol_index(data['data'], token_table, symbols_index))
                 else:
-                    res += struct.pack('<i', data['length'])
-                    res += data['data'].encode("ascii")
+                    res += PRPStringCodec.encode(data['data'], False)
             else:
-                res += struct.pack('<i', data)
+                res += struct.pack('<I', data)
 
-        return res
\ No newline at end of file
+        return res
+
+    @staticmethod
+    def _symbol_index(symbol: str, token_table: list, symbols_index: Optional[dict]) -> int:
+        return symbols_index[symbol] if symbols_index is not None else token_table.index(symbol)
\ No newline at end of file
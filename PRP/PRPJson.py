@@ -0,0 +1,61 @@
+from PRP import PRPReader, PRPWriter, PRPDefinition, PRPInstruction, PRPBlobStore
+from typing import Optional
+import json
+
+
+class PRPJson:
+    """
+    JSON representation of PRP: conversion of parsed level into JSON and back, also right in memory (no files involved)
+    """
+
+    @staticmethod
+    def from_reader(prp_reader: PRPReader, blob_store: Optional[PRPBlobStore] = None) -> dict:
+        return {
+            'is_raw': prp_reader.is_raw,
+            'flags': prp_reader.flags,
+            'unk0x13': prp_reader.unk0x13,
+            'definitions': [x.__dict__() for x in prp_reader.definitions],
+            'properties': [x.__dict__(blob_store) for x in prp_reader.instructions]
+        }
+
+    @staticmethod
+    def to_prp(json_data, blob_store: Optional[PRPBlobStore] = None) -> Optional[tuple]:
+        """
+        Returns (flags, definitions, instructions, is_raw, unk0x13) or None when JSON is invalid representation of PRP
+        """
+        if 'is_raw' in json_data and 'flags' in json_data and 'definitions' in json_data and 'properties' in json_data:
+            prp_is_raw: bool = json_data['is_raw']
+            prp_flags: int = json_data['flags']
+            prp_definitions: [PRPDefinition] = []
+            prp_properties: [PRPInstruction] = []
+            prp_unk0x13: int = json_data.get('unk0x13', 0)
+
+            for json_definition in json_data['definitions']:
+                prp_definitions.append(PRPDefinition.from_json(json_definition))
+
+            for json_property in json_data['properties']:
+                prp_properties.append(PRPInstruction.from_json(json_property, blob_store))
+
+            return prp_flags, prp_definitions, prp_properties, prp_is_raw, prp_unk0x13
+
+        return None
+
+    @staticmethod
+    def decompile_bytes(prp_contents, blob_store: Optional[PRPBlobStore] = None) -> str:
+        """
+        Decompiles PRP from memory (bytes, bytearray, memoryview) into JSON text, nothing is written to disk
+        except of blobs (when blob store is given)
+        """
+        prp_reader: PRPReader = PRPReader.from_bytes(prp_contents)
+        prp_reader.parse()
+        return json.dumps(PRPJson.from_reader(prp_reader, blob_store), indent=4, sort_keys=False)
+
+    @staticmethod
+    def compile_bytes(json_text: str, blob_store: Optional[PRPBlobStore] = None) -> Optional[bytes]:
+        """
+        Compiles JSON text into contents of PRP, returns None when JSON is invalid representation of PRP
+        """
+        prp_data: Optional[tuple] = PRPJson.to_prp(json.loads(json_text), blob_store)
+        if prp_data is None:
+            return None
+        return PRPWriter().to_bytes(*prp_data)
@@ -0,0 +1,244 @@
+from PRP import PRPInstruction, PRPOpCode
+from operator import itemgetter
+from typing import Optional
+import struct
+
+
+class PRPObjectShape:
+    """
+    Layout of object: sequence of op-codes from BeginObject to its EndObject.
+    When every member has fixed width, whole object is decoded or encoded by single precompiled struct.
+    """
+    # Kinds of member values
+    FK_NONE:   int = 0
+    FK_LENGTH: int = 1
+    FK_CHAR:   int = 2
+    FK_VALUE:  int = 3
+    FK_TUPLE:  int = 4
+    FK_STRING: int = 5
+
+    # op-code -> (kind, decode format, encode format) for members which width does not depend on flags
+    _FIXED_FIELDS: {PRPOpCode: (int, str, str)} = {
+        PRPOpCode.Array: (FK_LENGTH, 'I', 'i'), PRPOpCode.NamedArray: (FK_LENGTH, 'I', 'i'),
+        PRPOpCode.Container: (FK_LENGTH, 'I', 'i'), PRPOpCode.NamedContainer: (FK_LENGTH, 'I', 'i'),
+        PRPOpCode.BeginObject: (FK_NONE, '', ''), PRPOpCode.BeginNamedObject: (FK_NONE, '', ''),
+        PRPOpCode.EndObject: (FK_NONE, '', ''), PRPOpCode.EndArray: (FK_NONE, '', ''),
+        PRPOpCode.SkipMark: (FK_NONE, '', ''), PRPOpCode.EndOfStream: (FK_NONE, '', ''),
+        PRPOpCode.Char: (FK_CHAR, 'c', 'c'), PRPOpCode.NamedChar: (FK_CHAR, 'c', 'c'),
+        PRPOpCode.Bool: (FK_VALUE, '?', 'B'), PRPOpCode.NamedBool: (FK_VALUE, '?', 'B'),
+        PRPOpCode.Int8: (FK_VALUE, 'B', 'B'), PRPOpCode.NamedInt8: (FK_VALUE, 'B', 'B'),
+        PRPOpCode.Int16: (FK_VALUE, 'H', 'H'), PRPOpCode.NamedInt16: (FK_VALUE, 'H', 'H'),
+        PRPOpCode.Int32: (FK_VALUE, 'I', 'I'), PRPOpCode.NamedInt32: (FK_VALUE, 'I', 'I'),
+        PRPOpCode.Bitfield: (FK_VALUE, 'I', 'I'), PRPOpCode.NameBitfield: (FK_VALUE, 'I', 'I'),
+        PRPOpCode.Float32: (FK_TUPLE, 'f', 'f'), PRPOpCode.NamedFloat32: (FK_TUPLE, 'f', 'f'),
+        PRPOpCode.Float64: (FK_TUPLE, 'd', 'd'), PRPOpCode.NamedFloat64: (FK_TUPLE, 'd', 'd')
+    }
+
+    class FixedSegment:
+        """
+        Run of members with fixed width, packed by single struct
+        """
+        def __init__(self, fields: [(PRPOpCode, int, str, str)]):
+            self.fields: [(PRPOpCode, int, int)] = []  # (op-code, kind, index of value in unpacked tuple)
+            self.decode_struct: struct.Struct = struct.Struct('<' + ''.join(f"B{x[2]}" for x in fields))
+            self.encode_struct: struct.Struct = struct.Struct('<' + ''.join(f"B{x[3]}" for x in fields))
+            self.encode_template: list = []
+
+            op_code_positions: [int] = []
+            value_index: int = 0
+            for op_code, kind, _, _ in fields:
+                op_code_positions.append(value_index)
+                self.encode_template.append(op_code.value)
+                value_index += 1
+                if kind == PRPObjectShape.FK_NONE:
+                    self.fields.append((op_code, kind, -1))
+                else:
+                    self.fields.append((op_code, kind, value_index))
+                    self.encode_template.append(None)
+                    value_index += 1
+
+            # itemgetter of single item returns item itself, so expected value is built by same getter
+            self.op_code_getter = itemgetter(*op_code_positions)
+            self.expected_op_codes = self.op_code_getter(tuple(self.encode_template))
+
+    def __init__(self, op_codes: tuple, segments: list):
+        self._op_codes: tuple = op_codes
+        # Every segment is FixedSegment or PRPOpCode of member with variable width
+        self._segments: list = segments
+        self._fixed_count: int = sum(len(x.fields) for x in segments if isinstance(x, PRPObjectShape.FixedSegment))
+        self._is_fixed: bool = len(segments) == 1 and isinstance(segments[0], PRPObjectShape.FixedSegment)
+
+    @staticmethod
+    def field_of(op_code: PRPOpCode, vm_flags: int) -> Optional[tuple]:
+        """
+        Returns (kind, decode format, encode format) of member or None when its width depends on contents
+        """
+        field: Optional[tuple] = PRPObjectShape._FIXED_FIELDS.get(op_code)
+        if field is not None:
+            return field
+
+        is_indexed: bool = bool((vm_flags >> 3) & 1)
+        is_string_mode: bool = bool((vm_flags >> 2) & 1)
+
+        if op_code in [PRPOpCode.String, PRPOpCode.NamedString]:
+            return (PRPObjectShape.FK_STRING, 'I', 'i') if is_indexed else None
+
+        if op_code in [PRPOpCode.StringOrArray_E, PRPOpCode.StringOrArray_8E]:
+            if not is_string_mode:
+                return PRPObjectShape.FK_VALUE, 'I', 'I'
+            return (PRPObjectShape.FK_STRING, 'I', 'i') if is_indexed else None
+
+        if op_code == PRPOpCode.StringArray and not is_string_mode:
+            return PRPObjectShape.FK_VALUE, 'I', 'I'
+
+        return None
+
+    @staticmethod
+    def compile(op_codes: tuple, vm_flags: int):
+        """
+        Compiles shape, members with variable width are left to member by member codec.
+        Returns None when shape has no fixed members at all.
+        """
+        segments: list = []
+        fields: [(PRPOpCode, int, str, str)] = []
+        for op_code in op_codes:
+            field: Optional[tuple] = PRPObjectShape.field_of(op_code, vm_flags)
+            if field is not None:
+                fields.append((op_code, *field))
+                continue
+
+            if len(fields) > 0:
+                segments.append(PRPObjectShape.FixedSegment(fields))
+                fields = []
+            segments.append(op_code)
+
+        if len(fields) > 0:
+            segments.append(PRPObjectShape.FixedSegment(fields))
+
+        if not any(isinstance(x, PRPObjectShape.FixedSegment) for x in segments):
+            return None
+
+        return PRPObjectShape(op_codes, segments)
+
+    @property
+    def op_codes(self) -> tuple:
+        return self._op_codes
+
+    @property
+    def is_fixed(self) -> bool:
+        """
+        True when all members have fixed width
+        """
+        return self._is_fixed
+
+    @property
+    def fixed_count(self) -> int:
+        """
+        Count of members which are processed in batch
+        """
+        return self._fixed_count
+
+    def decode(self, buffer: bytes, offset: int, token_table: [str], decode_member) -> Optional[tuple]:
+        """
+        Decodes object at offset. Members with variable width are decoded by decode_member(offset) -> (instruction, next offset).
+        Returns (instructions, next offset) or None when object at offset has another shape.
+        """
+        result: [PRPInstruction] = []
+        for segment in self._segments:
+            if isinstance(segment, PRPOpCode):
+                if offset >= len(buffer) or not buffer[offset] == segment.value:
+                    return None
+                instruction, offset = decode_member(offset)
+                result.append(instruction)
+                continue
+
+            if offset + segment.decode_struct.size > len(buffer):
+                return None
+
+            values: tuple = segment.decode_struct.unpack_from(buffer, offset)
+            if not segment.op_code_getter(values) == segment.expected_op_codes:
+                return None
+
+            for op_code, kind, value_index in segment.fields:
+                if kind == PRPObjectShape.FK_NONE:
+                    result.append(PRPInstruction(op_code))
+                elif kind == PRPObjectShape.FK_VALUE:
+                    result.append(PRPInstruction(op_code, values[value_index]))
+                elif kind == PRPObjectShape.FK_TUPLE:
+                    result.append(PRPInstruction(op_code, (values[value_index],)))
+                elif kind == PRPObjectShape.FK_LENGTH:
+                    result.append(PRPInstruction(op_code, {'length': values[value_index]}))
+                elif kind == PRPObjectShape.FK_STRING:
+                    token_index: int = values[value_index]
+                    if token_index >= len(token_table):
+                        return None  # Let sequential decoder report it
+                    token: str = token_table[token_index]
+                    result.append(PRPInstruction(op_code, {'length': len(token), 'data': token}))
+                else:
+                    result.append(PRPInstruction(op_code, values[value_index].decode("ascii")))
+
+            offset += segment.decode_struct.size
+
+        return result, offset
+
+    def encode(self, instructions: [PRPInstruction], symbols_index: {str: int}, encode_member) -> bytes:
+        """
+        Encodes instructions of object, members with variable width are encoded by encode_member(instruction) -> bytes.
+        Raises when some value could not be packed by this shape
+        """
+        result: [bytes] = []
+        instruction_index: int = 0
+        for segment in self._segments:
+            if isinstance(segment, PRPOpCode):
+                result.append(encode_member(instructions[instruction_index]))
+                instruction_index += 1
+                continue
+
+            values: list = list(segment.encode_template)
+            for op_code, kind, value_index in segment.fields:
+                if not kind == PRPObjectShape.FK_NONE:
+                    data = instructions[instruction_index].op_data
+                    if kind == PRPObjectShape.FK_VALUE:
+                        values[value_index] = data
+                    elif kind == PRPObjectShape.FK_TUPLE:
+                        values[value_index] = data[0]
+                    elif kind == PRPObjectShape.FK_LENGTH:
+                        values[value_index] = data['length']
+                    elif kind == PRPObjectShape.FK_STRING:
+                        values[value_index] = symbols_index[data['data']]
+                    else:
+                        values[value_index] = data.encode("ascii")
+                instruction_index += 1
+
+            result.append(segment.encode_struct.pack(*values))
+
+        return b''.join(result)
+
+    @staticmethod
+    def decode_run(op_code: PRPOpCode, buffer: bytes, offset: int, count: int, vm_flags: int) -> Optional[list]:
+        """
+        Decodes run of count numeric members with same op-code (like Float32 entries of matrix) by one iter_unpack call.
+        Returns None when run is broken by another op-code or its members have no fixed width.
+        """
+        field: Optional[tuple] = PRPObjectShape.field_of(op_code, vm_flags)
+        if field is None or field[0] not in [PRPObjectShape.FK_VALUE, PRPObjectShape.FK_TUPLE]:
+            return None
+
+        run_struct: struct.Struct = PRPObjectShape._run_struct(field[1])
+        run_end: int = offset + run_struct.size * count
+        if run_end > len(buffer) or not buffer[offset:run_end:run_struct.size] == bytes((op_code.value,)) * count:
+            return None
+
+        if field[0] == PRPObjectShape.FK_TUPLE:
+            return [PRPInstruction(op_code, (value,)) for _, value in run_struct.iter_unpack(memoryview(buffer)[offset:run_end])]
+        return [PRPInstruction(op_code, value) for _, value in run_struct.iter_unpack(memoryview(buffer)[offset:run_end])]
+
+    _RUN_STRUCTS: {str: struct.Struct} = {}
+
+    @staticmethod
+    def _run_struct(value_format: str) -> struct.Struct:
+        run_struct: Optional[struct.Struct] = PRPObjectShape._RUN_STRUCTS.get(value_format)
+        if run_struct is None:
+            run_struct = struct.Struct(f"<B{value_format}")
+            PRPObjectShape._RUN_STRUCTS[value_format] = run_struct
+        return run_struct
@@ -41,6 +41,19 @@ class PRPOpCode(IntEnum):
     ERR_UNKNOWN = 0xFFFD,
     ERR_NO_TAG = 0xFFFE
 
+    def __str__(self):
+        # Python 3.11+ prints IntEnum as plain number, but JSON representation relies on 'PRPOpCode.Name'
+        return f"PRPOpCode.{self.name}"
+
+    @staticmethod
+    def from_json(value: str):
+        """
+        Accepts 'PRPOpCode.Name' and plain number (JSON produced by Python 3.11+ before this was fixed)
+        """
+        if value.isdigit():
+            return PRPOpCode(int(value))
+        return PRPOpCode[value.split('.')[1]]
+
     @staticmethod
     def from_byte(byte):
         if byte == 0x0E: return PRPOpCode.StringOrArray_E
@@ -50,6 +63,9 @@ class PRPOpCode(IntEnum):
         if byte < PRPOpCode.Array.value or byte > PRPOpCode.NameBitfield.value:
             return PRPOpCode.ERR_NO_TAG
 
+        if byte == PRPOpCode.Bitfield.value:
+            return PRPOpCode.Bitfield
+
         if byte == 128 or (16 <= byte <= 123):
             return PRPOpCode.ERR_UNKNOWN
 
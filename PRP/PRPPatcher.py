@@ -0,0 +1,186 @@
+from PRP import PRPReader, PRPByteCode, PRPInstruction, PRPOpCode, PRPStringCodec, PRPShapeCache, PRPStructureError
+from typing import Optional
+import bisect
+import hashlib
+import struct
+
+
+class PRPPatcher:
+    """
+    Exports selected top-level objects of PRP and splices edited objects back into it.
+    Rest of bytecode is never decoded: objects are found by pre-scan and untouched bytes are copied as is.
+    """
+    KEYS_COUNT_OFFSET: int = 0x17
+
+    def __init__(self, prp_file_path: str):
+        self._prp_path: str = prp_file_path
+        self._prp_reader: PRPReader = PRPReader(prp_file_path)
+        self._prp_data: bytes = bytes()
+        self._prp_objects: [(int, int, int)] = []
+        self._prp_objects_complete: bool = False
+
+    @property
+    def reader(self) -> PRPReader:
+        return self._prp_reader
+
+    def load(self):
+        """
+        Reads header, symbols table and definitions, bytecode is kept undecoded
+        """
+        self._prp_reader.probe(PRPReader.SECTION_DEFINITIONS)
+        with open(self._prp_path, "rb") as prp_file:
+            self._prp_data = prp_file.read()
+        self._prp_objects = []
+        self._prp_objects_complete = False
+
+    @property
+    def objects(self) -> [(int, int, int)]:
+        """
+        (offset in file, size, index of first instruction) of every top-level object, whole bytecode is scanned
+        """
+        self._scan_objects()
+        return self._prp_objects
+
+    def object_at(self, object_index: int) -> (int, int, int):
+        """
+        (offset in file, size, index of first instruction) of object, bytecode is scanned only up to this object
+        """
+        self._scan_objects(object_index + 1)
+        return self._prp_objects[object_index]
+
+    def select(self, index_ranges: Optional[list] = None, string_value: Optional[str] = None) -> [int]:
+        """
+        Returns indices of objects which are inside of any of index ranges (range objects) and contain string value
+        (as property name or value). Missing filter matches every object.
+        Selection by indices scans bytecode only up to last selected object, selection by string scans whole bytecode
+        """
+        if index_ranges is not None and string_value is None:
+            self._scan_objects(max(x.stop for x in index_ranges))
+            return sorted({x for index_range in index_ranges for x in index_range if x < len(self._prp_objects)})
+
+        selected: [int] = list(range(len(self.objects)))
+        if index_ranges is not None:
+            selected = [x for x in selected if any(x in index_range for index_range in index_ranges)]
+
+        if string_value is not None:
+            candidates: {int} = self._find_string_candidates(string_value)
+            selected = [x for x in selected if x in candidates and string_value in PRPPatcher.strings_of(self.decode_object(x))]
+
+        return selected
+
+    def decode_object(self, object_index: int) -> [PRPInstruction]:
+        offset, size, _ = self.object_at(object_index)
+        return self._decode_range(offset, size)
+
+    def digest_of(self, offset: int, size: int) -> str:
+        return hashlib.sha1(self._prp_data[offset:offset + size]).hexdigest()
+
+    def splice(self, patches: [(int, int, str, [PRPInstruction])]) -> bytes:
+        """
+        Returns contents of PRP where every patch (offset, size, digest of original object, new instructions) is applied.
+        Offsets and digests come from export, so objects are not searched again. New strings are appended to symbols table.
+        """
+        prp_flags: int = self._prp_reader.flags
+        is_indexed_strings: bool = bool((prp_flags >> 3) & 1)
+
+        symbols_table: [str] = list(self._prp_reader.symbols)
+        symbols_index: {str: int} = {}
+        for symbol_index, symbol in enumerate(symbols_table):
+            symbols_index.setdefault(symbol, symbol_index)
+
+        pieces: [bytes] = []
+        copied_end: int = self._prp_reader.bytecode_offset
+        objects_delta: int = 0
+
+        for offset, size, digest, instructions in sorted(patches, key=lambda x: x[0]):
+            if offset < copied_end or offset + size > len(self._prp_data):
+                raise PRPStructureError(f"Patch of object at {offset:#x} is out of bytecode or overlaps another patch", offset)
+            if self._prp_data[offset] not in PRPShapeCache.BEGIN_OBJECT_BYTES or not self.digest_of(offset, size) == digest:
+                raise PRPStructureError(f"Object at {offset:#x} does not match exported one (PRP was changed after export)", offset)
+
+            if is_indexed_strings:
+                for symbol in PRPPatcher.strings_of(instructions):
+                    if symbol not in symbols_index:
+                        symbols_index[symbol] = len(symbols_table)
+                        symbols_table.append(symbol)
+
+            # Header counts BeginObject op-codes of whole bytecode
+            objects_delta += len([x for x in instructions if x.op_code == PRPOpCode.BeginObject])
+            objects_delta -= len([x for x in self._decode_range(offset, size) if x.op_code == PRPOpCode.BeginObject])
+
+            pieces.append(self._prp_data[copied_end:offset])
+            pieces.append(b''.join(x.to_bytes(prp_flags, symbols_table if is_indexed_strings else None, symbols_index) for x in instructions))
+            copied_end = offset + size
+
+        pieces.append(self._prp_data[copied_end:])
+        return self._splice_head(symbols_table[len(self._prp_reader.symbols):], objects_delta) + b''.join(pieces)
+
+    @staticmethod
+    def strings_of(instructions: [PRPInstruction]) -> [str]:
+        """
+        Returns all strings (names and values) used by instructions
+        """
+        strings: [str] = []
+        for instruction in instructions:
+            if instruction.op_code in [PRPOpCode.String, PRPOpCode.NamedString, PRPOpCode.StringOrArray_E, PRPOpCode.StringOrArray_8E]:
+                if isinstance(instruction.op_data, dict):
+                    strings.append(instruction.op_data['data'])
+            elif instruction.op_code == PRPOpCode.StringArray and isinstance(instruction.op_data, list):
+                strings.extend(instruction.op_data)
+        return strings
+
+    def _scan_objects(self, count: Optional[int] = None):
+        """
+        Finds first count top-level objects (all of them when count is None), already found objects are not scanned again
+        """
+        if self._prp_objects_complete or (count is not None and len(self._prp_objects) >= count):
+            return
+
+        bytecode_offset: int = self._prp_reader.bytecode_offset
+        found: [(int, int, int)] = PRPByteCode.find_objects(memoryview(self._prp_data)[bytecode_offset:], self._prp_reader.flags, count)
+        self._prp_objects = [(bytecode_offset + begin, end - begin, instruction_index) for begin, end, instruction_index in found]
+        self._prp_objects_complete = count is None or len(found) < count
+
+    def _decode_range(self, offset: int, size: int) -> [PRPInstruction]:
+        byte_code: PRPByteCode = PRPByteCode(self._prp_data[offset:offset + size])
+        byte_code.prepare(self._prp_reader.flags, self._prp_reader.symbols, parallel_threshold=0)
+        return byte_code.instructions
+
+    def _find_string_candidates(self, string_value: str) -> {int}:
+        """
+        Returns indices of objects which bytes contain encoded string (token index or inline string).
+        Byte search could give false candidates, so they should be checked by decoding
+        """
+        patterns: [bytes] = []
+        if (self._prp_reader.flags >> 3) & 1:
+            patterns = [struct.pack('<I', x) for x, symbol in enumerate(self._prp_reader.symbols) if symbol == string_value]
+        else:
+            patterns = [PRPStringCodec.encode(string_value, False)]  # StringOrArray has no trailing zero, so it is prefix of both
+
+        object_offsets: [int] = [x[0] for x in self.objects]
+        candidates: {int} = set()
+        for pattern in patterns:
+            position: int = self._prp_data.find(pattern, self._prp_reader.bytecode_offset)
+            while position >= 0:
+                object_index: int = bisect.bisect_right(object_offsets, position) - 1
+                if object_index >= 0 and position < object_offsets[object_index] + self.objects[object_index][1]:
+                    candidates.add(object_index)
+                position = self._prp_data.find(pattern, position + 1)
+
+        return candidates
+
+    def _splice_head(self, new_symbols: [str], objects_delta: int) -> bytes:
+        """
+        Returns header, symbols table, objects counter and definitions with appended symbols and updated counters
+        """
+        symbols_end: int = self._prp_reader.symbols_end
+        new_symbols_bytes: bytes = b''.join(x.encode("ascii") + b"\x00" for x in new_symbols)
+
+        header: bytearray = bytearray(self._prp_data[:0x1F])
+        struct.pack_into('<ii', header, PRPPatcher.KEYS_COUNT_OFFSET,
+                         self._prp_reader.keys_count + len([x for x in new_symbols if len(x) > 0]),
+                         symbols_end + len(new_symbols_bytes) - 0x1F)
+
+        objects_count: int = self._prp_reader.objects_count + objects_delta
+        return bytes(header) + self._prp_data[0x1F:symbols_end] + new_symbols_bytes + struct.pack('<i', objects_count) + \
+            self._prp_data[symbols_end + 4:self._prp_reader.bytecode_offset]
@@ -1,20 +1,41 @@
-from PRP import PRPDefinition, PRPDefinitionType, PRPInstruction, PRPByteCode, PRPOpCode, PRPStructureError, PRPBadDefinitionError
-from typing import Optional
+from PRP import PRPDefinition, PRPDefinitionType, PRPInstruction, PRPByteCode, PRPOpCode, PRPStructureError, PRPBadDefinitionError, PRPStringCodec, PRPByteStream, PRPShapeCache
+from typing import Optional, Iterator, BinaryIO
+from contextlib import nullcontext, contextmanager
 import struct
+import os
 
 
 class PRPReader:
-    def __init__(self, prp_file_path: str):
+    # Sections of file which could be read by probe()
+    SECTION_HEADER: int = 1
+    SECTION_SYMBOLS: int = 2
+    SECTION_DEFINITIONS: int = 3
+
+    # Probe reads only few KB of file, so refill buffer should not be larger
+    PROBE_BUFFER_SIZE: int = 4 * 1024
+
+    def __init__(self, prp_file_path: Optional[str] = None):
         self._prp_path = prp_file_path
+        self._prp_stream: Optional[BinaryIO] = None
+        self._prp_memory: Optional[memoryview] = None
+        self._prp_buffer_size: int = PRPByteStream.DEFAULT_BUFFER_SIZE
         self._prp_magic_bytes: bytes = bytes()
         self._prp_is_raw: bool = False
         self._prp_flags: int = 0x0
+        self._prp_unk0x13: int = 0
         self._prp_total_keys_count: int = 0
         self._prp_data_offset: int = 0
         self._prp_string_table: [str] = []
         self._prp_objects_presented: int = 0
+        self._prp_symbols_end: int = 0
+        self._prp_bytecode_offset: int = 0
+        self._prp_file_size: Optional[int] = None
         self._prp_definitions: [PRPDefinition] = []
         self._prp_properties: Optional[PRPByteCode] = None
+        # Last section read by probe() and position right after it, rest of file is read on first access to instructions
+        self._prp_probed_section: Optional[int] = None
+        self._prp_probed_end: int = 0
+        self._prp_probed_stream: Optional[PRPByteStream] = None
 
     @property
     def is_raw(self) -> bool:
@@ -24,209 +45,367 @@ class PRPReader:
     def flags(self) -> int:
         return self._prp_flags
 
+    @property
+    def unk0x13(self) -> int:
+        return self._prp_unk0x13
+
+    @property
+    def keys_count(self) -> int:
+        return self._prp_total_keys_count
+
+    @property
+    def objects_count(self) -> int:
+        return self._prp_objects_presented
+
+    @property
+    def symbols(self) -> [str]:
+        return self._prp_string_table
+
+    @property
+    def symbols_end(self) -> int:
+        """
+        Offset right after symbols table, measured while table is read (data offset of header is not trusted)
+        """
+        return self._prp_symbols_end
+
+    @property
+    def bytecode_offset(self) -> int:
+        return self._prp_bytecode_offset
+
+    @property
+    def section_sizes(self) -> {str: Optional[int]}:
+        """
+        Sizes of sections in bytes (as measured while reading), None for sections which were not reached yet.
+        Size of bytecode is unknown for streams until it's read
+        """
+        is_symbols_read: bool = self._prp_symbols_end > 0
+        is_definitions_read: bool = self._prp_bytecode_offset > 0
+        return {
+            'header': 0x1F,
+            'symbols': self._prp_symbols_end - 0x1F if is_symbols_read else None,
+            'definitions': self._prp_bytecode_offset - self._prp_symbols_end if is_definitions_read else None,
+            'bytecode': self._prp_file_size - self._prp_bytecode_offset if is_definitions_read and self._prp_file_size is not None else None
+        }
+
     @property
     def definitions(self) -> [PRPDefinition]:
         return self._prp_definitions
 
     @property
     def instructions(self) -> [PRPInstruction]:
+        if self._prp_properties is None and self._prp_probed_section is not None:
+            self._parse_probed_rest()
+
         if self._prp_properties is not None:
             return self._prp_properties.instructions
 
-        raise RuntimeError("You should call parse() method before use this property!")
-
-    def parse(self):
-        with open(self._prp_path, "rb") as prp_file:
-            # Read header
-            self._prp_magic_bytes = prp_file.read(0xE)
-            self._prp_is_raw = bool.from_bytes(prp_file.read(0x1), "little")
-            self._prp_flags = int.from_bytes(prp_file.read(0x4), "little")
-            prp_file.seek(0x4, 1)
-            self._prp_total_keys_count = int.from_bytes(prp_file.read(0x4), "little")
-            self._prp_data_offset = int.from_bytes(prp_file.read(0x4), "little")
-            # Validate header
-            if not self._prp_magic_bytes == b"IOPacked v0.1\x00":
-                raise PRPStructureError("Invalid magic bytes signature", 0)
-
-            # Read symbols table
-            prp_file.seek(0x1F, 0)  # Seek to symbols region
-            tmp_symbol_buffer: [] = []
-
-            while len(self._prp_string_table) != self._prp_total_keys_count + 1:
-                c = prp_file.read(0x1)
-                if c == b'\x00':
-                    self._prp_string_table.append(''.join(tmp_symbol_buffer))
-                    tmp_symbol_buffer = []
-                else:
-                    tmp_symbol_buffer.append(c.decode("ascii"))
-
-            # Read objects counter
-            self._prp_objects_presented = int.from_bytes(prp_file.read(0x4), "little")
-
-            # Read ZDefinitions
-            # 1. Exchange root container
-            prp_zdef_container_root_op_code_byte = int.from_bytes(prp_file.read(0x1), "little")
-            prp_zdef_container_root_op_code: PRPOpCode = PRPOpCode.from_byte(prp_zdef_container_root_op_code_byte)
-            if not prp_zdef_container_root_op_code == PRPOpCode.Container:
-                raise PRPStructureError(f"Expected PRPOpCode.Container but got {prp_zdef_container_root_op_code_byte}", prp_file.tell())
-
-            # 2. Read entry by entry
-            self._prp_definitions = []
-            prp_zdef_entries_count: int = int.from_bytes(prp_file.read(0x4), "little")
-            if prp_zdef_entries_count <= 0:
-                raise PRPStructureError(f"Bad ZDef entries count in PRP file!", prp_file.tell())
-
-            for entry_idx in range(0, prp_zdef_entries_count):
-                # 1. Read op-code
-                prp_zdef_name_decl_op_code_byte = int.from_bytes(prp_file.read(0x1), "little")
-                prp_zdef_name_decl_op_code: PRPOpCode = PRPOpCode.from_byte(prp_zdef_name_decl_op_code_byte)
-                if not prp_zdef_name_decl_op_code == PRPOpCode.String:
-                    raise PRPStructureError(f"Expected PRPOpCode.String but got {prp_zdef_container_root_op_code_byte}", prp_file.tell())
-
-                prp_zdef_name_token_index: int = int.from_bytes(prp_file.read(0x4), "little")
-                if prp_zdef_name_token_index < 0 or prp_zdef_name_token_index >= len(self._prp_string_table):
-                    raise IndexError(f"Bad string token index (out of bounds): {prp_zdef_name_token_index}")
-
-                prp_zdef_name: str = self._prp_string_table[prp_zdef_name_token_index]
-
-                prp_zdef_type_kind_op_code_byte = int.from_bytes(prp_file.read(0x1), "little")
-                prp_zdef_type_kind_op_code: PRPOpCode = PRPOpCode.from_byte(prp_zdef_type_kind_op_code_byte)
-                if not prp_zdef_type_kind_op_code == PRPOpCode.Int32:
-                    raise PRPStructureError(f"Expected PRPOpCode.Int32 but got {prp_zdef_type_kind_op_code_byte}", prp_file.tell())
-
-                prp_zdef_type_kind_value: int = int.from_bytes(prp_file.read(0x4), "little")
-                prp_zdef_type_kind: PRPDefinitionType = PRPDefinitionType.from_byte(prp_zdef_type_kind_value)
-                if prp_zdef_type_kind == PRPDefinitionType.ERR_UNKNOWN:
-                    raise PRPStructureError(f"Got bad ZDEFINTION type kind {prp_zdef_type_kind_value}", prp_file.tell())
-
-                if prp_zdef_type_kind == PRPDefinitionType.Array_Int32:
-                    prp_zdef_value_arr_i32_op_code_value = int.from_bytes(prp_file.read(0x1), "little")
-                    prp_zdef_value_arr_i32_op_code: PRPOpCode = PRPOpCode.from_byte(prp_zdef_value_arr_i32_op_code_value)
-                    if not prp_zdef_value_arr_i32_op_code == PRPOpCode.Int32:
-                        raise PRPStructureError(f"Got bad ZDef<ArrI32> decl", prp_file.tell())
-
-                    prp_zdef_value_arr_i32_capacity: int = int.from_bytes(prp_file.read(0x4), "little")
-                    prp_zdef_value_arr_i32_begin_array_op_code_value = int.from_bytes(prp_file.read(0x1), "little")
-                    prp_zdef_value_arr_i32_begin_array_op_code: PRPOpCode = PRPOpCode.from_byte(prp_zdef_value_arr_i32_begin_array_op_code_value)
-                    if not prp_zdef_value_arr_i32_begin_array_op_code == PRPOpCode.Array:
-                        raise PRPStructureError(f"Expected Array op-code but got {prp_zdef_value_arr_i32_begin_array_op_code_value}", prp_file.tell())
-                    prp_zdef_value_arr_i32_capacity_arr: int = int.from_bytes(prp_file.read(0x4), "little")
-
-                    if not prp_zdef_value_arr_i32_capacity_arr == prp_zdef_value_arr_i32_capacity:
-                        raise PRPBadDefinitionError("ArrayInt32 capacity and BeginArray op-code length are not same")
-
-                    prp_zdef_value_arr_i32_entries: [int] = []
-                    for i32_entry_idx in range(0, prp_zdef_value_arr_i32_capacity_arr):
-                        prp_zdef_arr_i32_entry_op_code_value = int.from_bytes(prp_file.read(0x1), "little")
-                        prp_zdef_arr_i32_entry_op_code: PRPOpCode = PRPOpCode.from_byte(prp_zdef_arr_i32_entry_op_code_value)
-                        if not prp_zdef_arr_i32_entry_op_code == PRPOpCode.Int32:
-                            raise PRPStructureError(f"Expected Int32 decl but got {prp_zdef_arr_i32_entry_op_code_value}", prp_file.tell())
-
-                        prp_zdef_value_arr_i32_entries.append(int.from_bytes(prp_file.read(0x4), "little"))
-
-                    prp_zdef_arr_i32_end_array_op_code_value = int.from_bytes(prp_file.read(0x1), "little")
-                    prp_zdef_arr_i32_end_array_op_code: PRPOpCode = PRPOpCode.from_byte(prp_zdef_arr_i32_end_array_op_code_value)
-                    if not prp_zdef_arr_i32_end_array_op_code == PRPOpCode.EndArray:
-                        raise PRPStructureError(f"Expected EndArray op code but got {prp_zdef_arr_i32_end_array_op_code_value}", prp_file.tell())
-
-                    self._prp_definitions.append(PRPDefinition(prp_zdef_name, prp_zdef_type_kind, prp_zdef_value_arr_i32_entries))
-                elif prp_zdef_type_kind == PRPDefinitionType.Array_Float32:
-                    # Read base length
-                    prp_zdef_value_arr_i32_op_code_value = int.from_bytes(prp_file.read(0x1), "little")
-                    prp_zdef_value_arr_i32_op_code: PRPOpCode = PRPOpCode.from_byte(
-                        prp_zdef_value_arr_i32_op_code_value)
-                    if not prp_zdef_value_arr_i32_op_code == PRPOpCode.Int32:
-                        raise PRPStructureError(f"Got bad ZDef<ArrF32> decl", prp_file.tell())
-
-                    # Read array decl length
-                    prp_zdef_value_arr_i32_capacity: int = int.from_bytes(prp_file.read(0x4), "little")
-                    prp_zdef_value_arr_i32_begin_array_op_code_value = int.from_bytes(prp_file.read(0x1), "little")
-                    prp_zdef_value_arr_i32_begin_array_op_code: PRPOpCode = PRPOpCode.from_byte(
-                        prp_zdef_value_arr_i32_begin_array_op_code_value)
-                    if not prp_zdef_value_arr_i32_begin_array_op_code == PRPOpCode.Array:
-                        raise PRPStructureError(
-                            f"Expected Array op-code but got {prp_zdef_value_arr_i32_begin_array_op_code_value}",
-                            prp_file.tell())
-                    prp_zdef_value_arr_i32_capacity_arr: int = int.from_bytes(prp_file.read(0x4), "little")
-
-                    if not prp_zdef_value_arr_i32_capacity_arr == prp_zdef_value_arr_i32_capacity:
-                        raise PRPBadDefinitionError("ArrayInt32 capacity and BeginArray op-code length are not same")
-
-                    prp_zdef_value_arr_f32_entries: [float] = []
-                    for i32_entry_idx in range(0, prp_zdef_value_arr_i32_capacity_arr):
-                        prp_zdef_arr_i32_entry_op_code_value = int.from_bytes(prp_file.read(0x1), "little")
-                        prp_zdef_arr_i32_entry_op_code: PRPOpCode = PRPOpCode.from_byte(
-                            prp_zdef_arr_i32_entry_op_code_value)
-                        if not prp_zdef_arr_i32_entry_op_code == PRPOpCode.Float32:
-                            raise PRPStructureError(
-                                f"Expected Int32 decl but got {prp_zdef_arr_i32_entry_op_code_value}", prp_file.tell())
-
-                        prp_f32_val: float
-                        (prp_f32_val) = struct.unpack('<f', prp_file.read(0x4))
-                        prp_zdef_value_arr_f32_entries.append(prp_f32_val)
-
-                    prp_zdef_arr_i32_end_array_op_code_value = int.from_bytes(prp_file.read(0x1), "little")
-                    prp_zdef_arr_i32_end_array_op_code: PRPOpCode = PRPOpCode.from_byte(
-                        prp_zdef_arr_i32_end_array_op_code_value)
-                    if not prp_zdef_arr_i32_end_array_op_code == PRPOpCode.EndArray:
-                        raise PRPStructureError(
-                            f"Expected EndArray op code but got {prp_zdef_arr_i32_end_array_op_code_value}",
-                            prp_file.tell())
-
-                    self._prp_definitions.append(PRPDefinition(prp_zdef_name, prp_zdef_type_kind, prp_zdef_value_arr_f32_entries))
-                elif prp_zdef_type_kind in [PRPDefinitionType.StringRef_1, PRPDefinitionType.StringRef_2, PRPDefinitionType.StringRef_3]:
-                    prp_zdef_value_str_op_code_value = int.from_bytes(prp_file.read(0x1), "little")
-                    prp_zdef_value_str_op_code: PRPOpCode = PRPOpCode.from_byte(prp_zdef_value_str_op_code_value)
-                    if not prp_zdef_value_str_op_code == PRPOpCode.String:
-                        raise PRPStructureError(f"Expected StringRef but got {prp_zdef_value_str_op_code_value}", prp_file.tell())
-
-                    prp_zdef_value_str_ref_index: int = int.from_bytes(prp_file.read(0x4), "little")
-                    if prp_zdef_value_str_ref_index < 0 or prp_zdef_value_str_ref_index >= len(self._prp_string_table):
-                        raise IndexError(f"String ref is out of bounds ({prp_zdef_value_str_ref_index})")
-
-                    self._prp_definitions.append(PRPDefinition(prp_zdef_name, prp_zdef_type_kind,
-                                                               self._prp_string_table[prp_zdef_value_str_ref_index]))
-                elif prp_zdef_type_kind == PRPDefinitionType.StringRefTab:
-                    prp_zdef_value_str_ref_tab_op_code_value = int.from_bytes(prp_file.read(0x1), "little")
-                    prp_zdef_value_str_ref_tab_op_code: PRPOpCode = PRPOpCode.from_byte(prp_zdef_value_str_ref_tab_op_code_value)
-                    if not prp_zdef_value_str_ref_tab_op_code == PRPOpCode.Container:
-                        raise PRPStructureError(f"Expected Container but got {prp_zdef_value_str_ref_tab_op_code_value}", prp_file.tell())
-
-                    prp_zdef_value_str_ref_tab_capacity: int = int.from_bytes(prp_file.read(0x4), "little")
-                    prp_zdef_value_str_ref_value: [str] = []
-
-                    for str_ref_entry_idx in range(0, prp_zdef_value_str_ref_tab_capacity):
-                        # 1. Read string btopc
-                        prp_zdef_value_str_ref_tab_entry_op_code_value = int.from_bytes(prp_file.read(0x1), "little")
-                        prp_zdef_value_str_ref_tab_entry_op_code: PRPOpCode = PRPOpCode.from_byte(prp_zdef_value_str_ref_tab_entry_op_code_value)
-                        if not prp_zdef_value_str_ref_tab_entry_op_code == PRPOpCode.String:
-                            raise PRPStructureError(f"Expected String but got {prp_zdef_value_str_ref_tab_entry_op_code_value}", prp_file.tell())
-
-                        # 2. Exchange string
-                        if (self._prp_flags >> 3) & 1:
-                            # By index
-                            prp_zdef_value_str_ref_tab_entry_index: int = int.from_bytes(prp_file.read(0x4), "little")
-                            if prp_zdef_value_str_ref_tab_entry_index < 0 or prp_zdef_value_str_ref_tab_entry_index >= len(
-                                    self._prp_string_table):
-                                raise IndexError(
-                                    f"String ref is out of bounds ({prp_zdef_value_str_ref_tab_entry_index})")
-
-                            prp_zdef_value_str_ref_value.append(
-                                self._prp_string_table[prp_zdef_value_str_ref_tab_entry_index])
-                        else:
-                            # By raw contents
-                            prp_zdef_value_str_ref_tab_entry_length: int = int.from_bytes(prp_file.read(0x4), "little")
-                            prp_zdef_value_str_ref_value.append(prp_file.read(prp_zdef_value_str_ref_tab_entry_length).decode("ascii"))
-
-                    self._prp_definitions.append(PRPDefinition(prp_zdef_name, prp_zdef_type_kind, prp_zdef_value_str_ref_value))
-                else:
-                    raise NotImplementedError(f"Type kind {prp_zdef_type_kind_value} not implemented yet")
+        raise RuntimeError("You should call parse() or probe() method before use this property!")
+
+    @staticmethod
+    def from_stream(stream: BinaryIO, buffer_size: int = PRPByteStream.DEFAULT_BUFFER_SIZE, size: Optional[int] = None):
+        """
+        Creates reader of any readable binary stream (stdin, socket, decompressor, etc.).
+        Stream is never seeked and read through refill buffer of buffer_size bytes.
+        Size of whole PRP (when known) lets probe() report size of bytecode without reading it
+        """
+        prp_reader: PRPReader = PRPReader()
+        prp_reader._prp_stream = stream
+        prp_reader._prp_buffer_size = buffer_size
+        prp_reader._prp_file_size = size
+        return prp_reader
+
+    @staticmethod
+    def from_bytes(buffer):
+        """
+        Creates reader of PRP which is already in memory (bytes, bytearray, memoryview).
+        Buffer is not copied: bytecode is decoded right from it, so it should not be changed until parse() is done
+        """
+        prp_reader: PRPReader = PRPReader()
+        prp_reader._prp_memory = memoryview(buffer).cast('B')
+        prp_reader._prp_file_size = len(prp_reader._prp_memory)
+        return prp_reader
+
+    def parse(self, shape_cache: Optional[PRPShapeCache] = None, parallel_threshold: Optional[int] = None, max_workers: Optional[int] = None):
+        """
+        Reads whole file. Shape cache could be shared between several files to reuse learned layouts of objects.
+        Large bytecode is decoded in process pool, see PRPByteCode.prepare
+        """
+        with self._open_byte_stream(self._prp_buffer_size) as prp_file:
+            self._parse_header_and_definitions(prp_file)
 
             # Read ByteCode
-            self._prp_properties = PRPByteCode(prp_file.read())
-            self._prp_properties.prepare(self._prp_flags, self._prp_string_table)
+            if self._prp_stream is not None:
+                self._prp_properties = PRPByteCode.from_stream(prp_file)
+            else:
+                self._prp_properties = PRPByteCode(prp_file.read_rest())
+                self._prp_file_size = prp_file.tell()
+
+            self._prp_properties.prepare(self._prp_flags, self._prp_string_table, shape_cache, parallel_threshold, max_workers)
 
             # Uncomment to debug
             # with open("dump.json", "a+") as json_out:
             #     import json
             #     json_out.write(json.dumps([x.__dict__() for x in self._prp_properties.instructions], indent=4, sort_keys=False))
+
+    def probe(self, section: int = SECTION_DEFINITIONS):
+        """
+        Reads file up to given section (SECTION_HEADER, SECTION_SYMBOLS or SECTION_DEFINITIONS) without touching bytecode.
+        Rest of file is read and decoded on first access to instructions
+        """
+        self._prp_properties = None
+        self._prp_probed_stream = None
+        self._prp_symbols_end = 0
+        self._prp_bytecode_offset = 0
+        if self._prp_path is not None:
+            self._prp_file_size = os.path.getsize(self._prp_path)
+
+        with self._open_byte_stream(min(self._prp_buffer_size, PRPReader.PROBE_BUFFER_SIZE)) as prp_file:
+            self._parse_header(prp_file)
+            if section >= PRPReader.SECTION_SYMBOLS:
+                self._parse_symbols(prp_file)
+            if section >= PRPReader.SECTION_DEFINITIONS:
+                self._parse_definitions(prp_file)
+
+            self._prp_probed_section = section
+            self._prp_probed_end = prp_file.tell()
+            if self._prp_stream is not None:
+                # Stream could not be reopened, so rest of it will be read from same buffer
+                self._prp_probed_stream = prp_file
+
+    def _parse_probed_rest(self):
+        with self._open_probed_rest() as prp_file:
+            if self._prp_probed_section < PRPReader.SECTION_SYMBOLS:
+                self._parse_symbols(prp_file)
+            if self._prp_probed_section < PRPReader.SECTION_DEFINITIONS:
+                self._parse_definitions(prp_file)
+
+            self._prp_properties = PRPByteCode(prp_file.read_rest())
+            self._prp_file_size = prp_file.tell()
+            self._prp_properties.prepare(self._prp_flags, self._prp_string_table)
+
+        self._prp_probed_section = None
+        self._prp_probed_stream = None
+
+    @contextmanager
+    def _open_probed_rest(self) -> Iterator[PRPByteStream]:
+        if self._prp_probed_stream is not None:
+            yield self._prp_probed_stream
+            return
+
+        if self._prp_memory is not None:
+            yield PRPByteStream.from_buffer(self._prp_memory[self._prp_probed_end:], self._prp_probed_end)
+            return
+
+        with open(self._prp_path, "rb") as prp_source:
+            prp_source.seek(self._prp_probed_end)
+            yield PRPByteStream(prp_source, self._prp_buffer_size, self._prp_probed_end)
+
+    def iter_instructions(self) -> Iterator[PRPInstruction]:
+        """
+        Reads header and definitions, then yields instructions one by one without keeping them in memory
+        """
+        with self._open_byte_stream(self._prp_buffer_size) as prp_file:
+            self._parse_header_and_definitions(prp_file)
+            yield from PRPByteCode.from_stream(prp_file).stream(self._prp_flags, self._prp_string_table)
+
+    @contextmanager
+    def _open_byte_stream(self, buffer_size: int) -> Iterator[PRPByteStream]:
+        if self._prp_memory is not None:
+            yield PRPByteStream.from_buffer(self._prp_memory)
+            return
+
+        with self._open_source() as prp_source:
+            yield PRPByteStream(prp_source, buffer_size)
+
+    def _open_source(self):
+        if self._prp_stream is not None:
+            return nullcontext(self._prp_stream)
+        return open(self._prp_path, "rb")
+
+    def _parse_header_and_definitions(self, prp_file: PRPByteStream):
+        self._parse_header(prp_file)
+        self._parse_symbols(prp_file)
+        self._parse_definitions(prp_file)
+
+    def _parse_header(self, prp_file: PRPByteStream):
+        # Read header
+        self._prp_magic_bytes = bytes(prp_file.read(0xE))
+        self._prp_is_raw = bool.from_bytes(prp_file.read(0x1), "little")
+        self._prp_flags = int.from_bytes(prp_file.read(0x4), "little")
+        self._prp_unk0x13 = int.from_bytes(prp_file.read(0x4), "little", signed=True)
+        self._prp_total_keys_count = int.from_bytes(prp_file.read(0x4), "little")
+        self._prp_data_offset = int.from_bytes(prp_file.read(0x4), "little")
+        # Validate header
+        if not self._prp_magic_bytes == b"IOPacked v0.1\x00":
+            raise PRPStructureError("Invalid magic bytes signature", 0)
+
+    def _parse_symbols(self, prp_file: PRPByteStream):
+        # Read symbols table (right after header at 0x1F)
+        self._prp_string_table = []
+        while len(self._prp_string_table) != self._prp_total_keys_count + 1:
+            self._prp_string_table.append(prp_file.read_cstring())
+        self._prp_symbols_end = prp_file.tell()
+
+    def _parse_definitions(self, prp_file: PRPByteStream):
+        # Read objects counter
+        self._prp_objects_presented = int.from_bytes(prp_file.read(0x4), "little")
+
+        # Read ZDefinitions
+        # 1. Exchange root container
+        prp_zdef_container_root_op_code_byte = int.from_bytes(prp_file.read(0x1), "little")
+        prp_zdef_container_root_op_code: PRPOpCode = PRPOpCode.from_byte(prp_zdef_container_root_op_code_byte)
+        if not prp_zdef_container_root_op_code == PRPOpCode.Container:
+            raise PRPStructureError(f"Expected PRPOpCode.Container but got {prp_zdef_container_root_op_code_byte}", prp_file.tell())
+
+        # 2. Read entry by entry
+        self._prp_definitions = []
+        prp_zdef_entries_count: int = int.from_bytes(prp_file.read(0x4), "little")
+        if prp_zdef_entries_count <= 0:
+            raise PRPStructureError(f"Bad ZDef entries count in PRP file!", prp_file.tell())
+
+        for entry_idx in range(0, prp_zdef_entries_count):
+            # 1. Read op-code
+            prp_zdef_name_decl_op_code_byte = int.from_bytes(prp_file.read(0x1), "little")
+            prp_zdef_name_decl_op_code: PRPOpCode = PRPOpCode.from_byte(prp_zdef_name_decl_op_code_byte)
+            if not prp_zdef_name_decl_op_code == PRPOpCode.String:
+                raise PRPStructureError(f"Expected PRPOpCode.String but got {prp_zdef_container_root_op_code_byte}", prp_file.tell())
+
+            prp_zdef_name_token_index: int = int.from_bytes(prp_file.read(0x4), "little")
+            if prp_zdef_name_token_index < 0 or prp_zdef_name_token_index >= len(self._prp_string_table):
+                raise IndexError(f"Bad string token index (out of bounds): {prp_zdef_name_token_index}")
+
+            prp_zdef_name: str = self._prp_string_table[prp_zdef_name_token_index]
+
+            prp_zdef_type_kind_op_code_byte = int.from_bytes(prp_file.read(0x1), "little")
+            prp_zdef_type_kind_op_code: PRPOpCode = PRPOpCode.from_byte(prp_zdef_type_kind_op_code_byte)
+            if not prp_zdef_type_kind_op_code == PRPOpCode.Int32:
+                raise PRPStructureError(f"Expected PRPOpCode.Int32 but got {prp_zdef_type_kind_op_code_byte}", prp_file.tell())
+
+            prp_zdef_type_kind_value: int = int.from_bytes(prp_file.read(0x4), "little")
+            prp_zdef_type_kind: PRPDefinitionType = PRPDefinitionType.from_byte(prp_zdef_type_kind_value)
+            if prp_zdef_type_kind == PRPDefinitionType.ERR_UNKNOWN:
+                raise PRPStructureError(f"Got bad ZDEFINTION type kind {prp_zdef_type_kind_value}", prp_file.tell())
+
+            if prp_zdef_type_kind == PRPDefinitionType.Array_Int32:
+                prp_zdef_value_arr_i32_op_code_value = int.from_bytes(prp_file.read(0x1), "little")
+                prp_zdef_value_arr_i32_op_code: PRPOpCode = PRPOpCode.from_byte(prp_zdef_value_arr_i32_op_code_value)
+                if not prp_zdef_value_arr_i32_op_code == PRPOpCode.Int32:
+                    raise PRPStructureError(f"Got bad ZDef<ArrI32> decl", prp_file.tell())
+
+                prp_zdef_value_arr_i32_capacity: int = int.from_bytes(prp_file.read(0x4), "little")
+                prp_zdef_value_arr_i32_begin_array_op_code_value = int.from_bytes(prp_file.read(0x1), "little")
+                prp_zdef_value_arr_i32_begin_array_op_code: PRPOpCode = PRPOpCode.from_byte(prp_zdef_value_arr_i32_begin_array_op_code_value)
+                if not prp_zdef_value_arr_i32_begin_array_op_code == PRPOpCode.Array:
+                    raise PRPStructureError(f"Expected Array op-code but got {prp_zdef_value_arr_i32_begin_array_op_code_value}", prp_file.tell())
+                prp_zdef_value_arr_i32_capacity_arr: int = int.from_bytes(prp_file.read(0x4), "little")
+
+                if not prp_zdef_value_arr_i32_capacity_arr == prp_zdef_value_arr_i32_capacity:
+                    raise PRPBadDefinitionError("ArrayInt32 capacity and BeginArray op-code length are not same")
+
+                prp_zdef_value_arr_i32_entries: [int] = []
+                for i32_entry_idx in range(0, prp_zdef_value_arr_i32_capacity_arr):
+                    prp_zdef_arr_i32_entry_op_code_value = int.from_bytes(prp_file.read(0x1), "little")
+                    prp_zdef_arr_i32_entry_op_code: PRPOpCode = PRPOpCode.from_byte(prp_zdef_arr_i32_entry_op_code_value)
+                    if not prp_zdef_arr_i32_entry_op_code == PRPOpCode.Int32:
+                        raise PRPStructureError(f"Expected Int32 decl but got {prp_zdef_arr_i32_entry_op_code_value}", prp_file.tell())
+
+                    prp_zdef_value_arr_i32_entries.append(int.from_bytes(prp_file.read(0x4), "little"))
+
+                prp_zdef_arr_i32_end_array_op_code_value = int.from_bytes(prp_file.read(0x1), "little")
+                prp_zdef_arr_i32_end_array_op_code: PRPOpCode = PRPOpCode.from_byte(prp_zdef_arr_i32_end_array_op_code_value)
+                if not prp_zdef_arr_i32_end_array_op_code == PRPOpCode.EndArray:
+                    raise PRPStructureError(f"Expected EndArray op code but got {prp_zdef_arr_i32_end_array_op_code_value}", prp_file.tell())
+
+                self._prp_definitions.append(PRPDefinition(prp_zdef_name, prp_zdef_type_kind, prp_zdef_value_arr_i32_entries))
+            elif prp_zdef_type_kind == PRPDefinitionType.Array_Float32:
+                # Read base length
+                prp_zdef_value_arr_i32_op_code_value = int.from_bytes(prp_file.read(0x1), "little")
+                prp_zdef_value_arr_i32_op_code: PRPOpCode = PRPOpCode.from_byte(
+                    prp_zdef_value_arr_i32_op_code_value)
+                if not prp_zdef_value_arr_i32_op_code == PRPOpCode.Int32:
+                    raise PRPStructureError(f"Got bad ZDef<ArrF32> decl", prp_file.tell())
+
+                # Read array decl length
+                prp_zdef_value_arr_i32_capacity: int = int.from_bytes(prp_file.read(0x4), "little")
+                prp_zdef_value_arr_i32_begin_array_op_code_value = int.from_bytes(prp_file.read(0x1), "little")
+                prp_zdef_value_arr_i32_begin_array_op_code: PRPOpCode = PRPOpCode.from_byte(
+                    prp_zdef_value_arr_i32_begin_array_op_code_value)
+                if not prp_zdef_value_arr_i32_begin_array_op_code == PRPOpCode.Array:
+                    raise PRPStructureError(
+                        f"Expected Array op-code but got {prp_zdef_value_arr_i32_begin_array_op_code_value}",
+                        prp_file.tell())
+                prp_zdef_value_arr_i32_capacity_arr: int = int.from_bytes(prp_file.read(0x4), "little")
+
+                if not prp_zdef_value_arr_i32_capacity_arr == prp_zdef_value_arr_i32_capacity:
+                    raise PRPBadDefinitionError("ArrayInt32 capacity and BeginArray op-code length are not same")
+
+                prp_zdef_value_arr_f32_entries: [float] = []
+                for i32_entry_idx in range(0, prp_zdef_value_arr_i32_capacity_arr):
+                    prp_zdef_arr_i32_entry_op_code_value = int.from_bytes(prp_file.read(0x1), "little")
+                    prp_zdef_arr_i32_entry_op_code: PRPOpCode = PRPOpCode.from_byte(
+                        prp_zdef_arr_i32_entry_op_code_value)
+                    if not prp_zdef_arr_i32_entry_op_code == PRPOpCode.Float32:
+                        raise PRPStructureError(
+                            f"Expected Int32 decl but got {prp_zdef_arr_i32_entry_op_code_value}", prp_file.tell())
+
+                    prp_f32_val: float
+                    (prp_f32_val) = struct.unpack('<f', prp_file.read(0x4))
+                    prp_zdef_value_arr_f32_entries.append(prp_f32_val)
+
+                prp_zdef_arr_i32_end_array_op_code_value = int.from_bytes(prp_file.read(0x1), "little")
+                prp_zdef_arr_i32_end_array_op_code: PRPOpCode = PRPOpCode.from_byte(
+                    prp_zdef_arr_i32_end_array_op_code_value)
+                if not prp_zdef_arr_i32_end_array_op_code == PRPOpCode.EndArray:
+                    raise PRPStructureError(
+                        f"Expected EndArray op code but got {prp_zdef_arr_i32_end_array_op_code_value}",
+                        prp_file.tell())
+
+                self._prp_definitions.append(PRPDefinition(prp_zdef_name, prp_zdef_type_kind, prp_zdef_value_arr_f32_entries))
+            elif prp_zdef_type_kind in [PRPDefinitionType.StringRef_1, PRPDefinitionType.StringRef_2, PRPDefinitionType.StringRef_3]:
+                prp_zdef_value_str_op_code_value = int.from_bytes(prp_file.read(0x1), "little")
+                prp_zdef_value_str_op_code: PRPOpCode = PRPOpCode.from_byte(prp_zdef_value_str_op_code_value)
+                if not prp_zdef_value_str_op_code == PRPOpCode.String:
+                    raise PRPStructureError(f"Expected StringRef but got {prp_zdef_value_str_op_code_value}", prp_file.tell())
+
+                prp_zdef_value_str_ref_index: int = int.from_bytes(prp_file.read(0x4), "little")
+                if prp_zdef_value_str_ref_index < 0 or prp_zdef_value_str_ref_index >= len(self._prp_string_table):
+                    raise IndexError(f"String ref is out of bounds ({prp_zdef_value_str_ref_index})")
+
+                self._prp_definitions.append(PRPDefinition(prp_zdef_name, prp_zdef_type_kind,
+                                                           self._prp_string_table[prp_zdef_value_str_ref_index]))
+            elif prp_zdef_type_kind == PRPDefinitionType.StringRefTab:
+                prp_zdef_value_str_ref_tab_op_code_value = int.from_bytes(prp_file.read(0x1), "little")
+                prp_zdef_value_str_ref_tab_op_code: PRPOpCode = PRPOpCode.from_byte(prp_zdef_value_str_ref_tab_op_code_value)
+                if not prp_zdef_value_str_ref_tab_op_code == PRPOpCode.Container:
+                    raise PRPStructureError(f"Expected Container but got {prp_zdef_value_str_ref_tab_op_code_value}", prp_file.tell())
+
+                prp_zdef_value_str_ref_tab_capacity: int = int.from_bytes(prp_file.read(0x4), "little")
+                prp_zdef_value_str_ref_value: [str] = []
+
+                for str_ref_entry_idx in range(0, prp_zdef_value_str_ref_tab_capacity):
+                    # 1. Read string btopc
+                    prp_zdef_value_str_ref_tab_entry_op_code_value = int.from_bytes(prp_file.read(0x1), "little")
+                    prp_zdef_value_str_ref_tab_entry_op_code: PRPOpCode = PRPOpCode.from_byte(prp_zdef_value_str_ref_tab_entry_op_code_value)
+                    if not prp_zdef_value_str_ref_tab_entry_op_code == PRPOpCode.String:
+                        raise PRPStructureError(f"Expected String but got {prp_zdef_value_str_ref_tab_entry_op_code_value}", prp_file.tell())
+
+                    # 2. Exchange string
+                    if (self._prp_flags >> 3) & 1:
+                        # By index
+                        prp_zdef_value_str_ref_tab_entry_index: int = int.from_bytes(prp_file.read(0x4), "little")
+                        if prp_zdef_value_str_ref_tab_entry_index < 0 or prp_zdef_value_str_ref_tab_entry_index >= len(
+                                self._prp_string_table):
+                            raise IndexError(
+                                f"String ref is out of bounds ({prp_zdef_value_str_ref_tab_entry_index})")
+
+                        prp_zdef_value_str_ref_value.append(
+                            self._prp_string_table[prp_zdef_value_str_ref_tab_entry_index])
+                    else:
+                        # By raw contents
+                        prp_zdef_value_str_ref_value.append(PRPStringCodec.read_from(prp_file))
+
+                self._prp_definitions.append(PRPDefinition(prp_zdef_name, prp_zdef_type_kind, prp_zdef_value_str_ref_value))
+            else:
+                raise NotImplementedError(f"Type kind {prp_zdef_type_kind_value} not implemented yet")
+
+        self._prp_bytecode_offset = prp_file.tell()
@@ -0,0 +1,115 @@
+from PRP import PRPInstruction, PRPOpCode, PRPObjectShape
+from typing import Optional
+import struct
+
+
+class PRPShapeCache:
+    """
+    Learns shapes of objects while they are decoded or encoded and reuses them for next objects with same layout.
+    Cache could be shared between several files, shapes are kept per flags.
+    """
+    MAX_CANDIDATES: int = 8
+    BEGIN_OBJECT_BYTES: bytes = bytes((PRPOpCode.BeginObject.value, PRPOpCode.BeginNamedObject.value))
+
+    def __init__(self):
+        self._shapes: {(int, tuple): Optional[PRPObjectShape]} = {}
+        # (flags, first member op-code byte) -> most recently used shapes which start with that member
+        self._candidates: {(int, int): [PRPObjectShape]} = {}
+        self._objects_total: int = 0
+        self._objects_batched: int = 0
+        self._instructions_total: int = 0
+        self._instructions_batched: int = 0
+
+    def shape_of(self, op_codes: tuple, vm_flags: int) -> Optional[PRPObjectShape]:
+        """
+        Returns compiled shape for sequence of op-codes or None when it could not be compiled
+        """
+        key: (int, tuple) = (vm_flags, op_codes)
+        if key in self._shapes:
+            return self._shapes[key]
+
+        shape: Optional[PRPObjectShape] = PRPObjectShape.compile(op_codes, vm_flags)
+        self._shapes[key] = shape
+        if shape is not None and len(op_codes) > 1:
+            self._candidates.setdefault((vm_flags, op_codes[1].value), []).append(shape)
+        return shape
+
+    def learn(self, instructions: [PRPInstruction], vm_flags: int):
+        """
+        Remembers shape of object which was decoded without cache
+        """
+        self._objects_total += 1
+        self.shape_of(tuple(x.op_code for x in instructions), vm_flags)
+
+    def decode_object(self, buffer: bytes, offset: int, vm_flags: int, token_table: [str], decode_member) -> Optional[tuple]:
+        """
+        Tries to decode object at offset by one of known shapes. Returns (instructions, next offset) or None.
+        Members with variable width are decoded by decode_member(offset) -> (instruction, next offset)
+        """
+        if offset + 1 >= len(buffer):
+            return None
+
+        candidates: Optional[list] = self._candidates.get((vm_flags, buffer[offset + 1]))
+        if candidates is None:
+            return None
+
+        for candidate_index, shape in enumerate(candidates[:PRPShapeCache.MAX_CANDIDATES]):
+            decoded: Optional[tuple] = shape.decode(buffer, offset, token_table, decode_member)
+            if decoded is not None:
+                if candidate_index > 0:
+                    candidates.insert(0, candidates.pop(candidate_index))
+                self._objects_total += 1
+                self._objects_batched += 1
+                self._instructions_batched += shape.fixed_count
+                return decoded
+
+        return None
+
+    def encode_object(self, instructions: [PRPInstruction], vm_flags: int, symbols_index: {str: int}, encode_member) -> Optional[bytes]:
+        """
+        Encodes object (from BeginObject to its EndObject) by its shape. Returns None when it should be encoded member by member.
+        Members with variable width are encoded by encode_member(instruction) -> bytes
+        """
+        self._objects_total += 1
+        shape: Optional[PRPObjectShape] = self.shape_of(tuple(x.op_code for x in instructions), vm_flags)
+        if shape is None:
+            return None
+
+        try:
+            result: bytes = shape.encode(instructions, symbols_index, encode_member)
+        except (KeyError, TypeError, AttributeError, IndexError, UnicodeError, ArithmeticError, ValueError, struct.error):
+            return None  # Member by member encoder will report the problem
+
+        self._objects_batched += 1
+        self._instructions_batched += shape.fixed_count
+        return result
+
+    def add_batched(self, count: int):
+        """
+        Accounts instructions which were processed in batch outside of objects (runs of numeric values)
+        """
+        self._instructions_batched += count
+
+    def add_total(self, count: int):
+        self._instructions_total += count
+
+    def merge(self, statistics: dict):
+        """
+        Accounts objects and instructions which were processed by another cache (in worker process)
+        """
+        self._objects_total += statistics['objects']
+        self._objects_batched += statistics['objects_batched']
+        self._instructions_total += statistics['instructions']
+        self._instructions_batched += statistics['instructions_batched']
+
+    def statistics(self) -> dict:
+        return {
+            'shapes': len([x for x in self._shapes.values() if x is not None]),
+            'fixed_shapes': len([x for x in self._shapes.values() if x is not None and x.is_fixed]),
+            'uncompiled_shapes': len([x for x in self._shapes.values() if x is None]),
+            'objects': self._objects_total,
+            'objects_batched': self._objects_batched,
+            'instructions': self._instructions_total,
+            'instructions_batched': self._instructions_batched,
+            'coverage': self._instructions_batched / self._instructions_total if self._instructions_total > 0 else 0.0
+        }
@@ -0,0 +1,337 @@
+from PRP import PRPReader, PRPInstruction, PRPOpCode, PRPDefinition
+from multiprocessing import shared_memory, resource_tracker
+from typing import Optional, Iterator
+from array import array
+import struct
+import json
+import sys
+import os
+
+
+class PRPSharedLevel:
+    """
+    Parsed level published into shared memory block as columns: op-codes, integer and float values, offsets of payloads
+    (RawData bytes, StringArray indices) and string table. Other processes attach read-only view without copy and parse.
+    Block lives until owner calls unlink() (or leaves 'with' block), every process should close() its view
+    """
+    MAGIC: bytes = b"PRPSHM01"
+    HEADER_FORMAT: str = '<8sqqqqq'  # magic, instructions, strings, payload heap size, string heap size, metadata size
+    ALIGNMENT: int = 8
+
+    LENGTH_OP_CODES: {PRPOpCode} = {PRPOpCode.Array, PRPOpCode.NamedArray, PRPOpCode.Container, PRPOpCode.NamedContainer}
+    INTEGER_OP_CODES: {PRPOpCode} = {PRPOpCode.Int8, PRPOpCode.NamedInt8, PRPOpCode.Int16, PRPOpCode.NamedInt16,
+                                     PRPOpCode.Int32, PRPOpCode.NamedInt32, PRPOpCode.Bitfield, PRPOpCode.NameBitfield}
+    BOOL_OP_CODES: {PRPOpCode} = {PRPOpCode.Bool, PRPOpCode.NamedBool}
+    CHAR_OP_CODES: {PRPOpCode} = {PRPOpCode.Char, PRPOpCode.NamedChar}
+    FLOAT_OP_CODES: {PRPOpCode} = {PRPOpCode.Float32, PRPOpCode.NamedFloat32, PRPOpCode.Float64, PRPOpCode.NamedFloat64}
+    STRING_OP_CODES: {PRPOpCode} = {PRPOpCode.String, PRPOpCode.NamedString}
+    STRING_OR_ARRAY_OP_CODES: {PRPOpCode} = {PRPOpCode.StringOrArray_E, PRPOpCode.StringOrArray_8E}
+    RAW_DATA_OP_CODES: {PRPOpCode} = {PRPOpCode.RawData, PRPOpCode.NamedRawData}
+    OP_CODES_BY_BYTE: {int: PRPOpCode} = {x.value: x for x in PRPOpCode}
+    # SharedMemory(track=False) appeared in Python 3.13
+    IS_TRACK_SUPPORTED: bool = sys.version_info >= (3, 13)
+
+    def __init__(self, block: shared_memory.SharedMemory, is_owner: bool):
+        self._block: Optional[shared_memory.SharedMemory] = block
+        self._name: str = block.name
+        self._is_owner: bool = is_owner
+        # Publisher keeps handle of block to unlink it after close()
+        self._owned_block: Optional[shared_memory.SharedMemory] = block if is_owner else None
+        self._strings: [Optional[str]] = []
+        self._instructions: Optional[list] = None
+        self._views: [memoryview] = []
+        self._map_columns()
+
+    def __reduce__(self):
+        # Workers get name of block and attach to it instead of pickled copy of level
+        return PRPSharedLevel.attach, (self.name,)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        if self._is_owner:
+            self.unlink()
+
+    @staticmethod
+    def publish(prp_reader: PRPReader, name: Optional[str] = None):
+        """
+        Copies parsed level into new shared memory block, returned level owns the block
+        """
+        instructions: [PRPInstruction] = prp_reader.instructions
+        op_codes: bytearray = bytearray(len(instructions))
+        values: array = array('q', bytes(8 * len(instructions)))
+        floats: array = array('d', bytes(8 * len(instructions)))
+        offsets: array = array('q', [0])
+        heap: bytearray = bytearray()
+        strings_index: {str: int} = {}
+
+        def intern(string: str) -> int:
+            return strings_index.setdefault(string, len(strings_index))
+
+        for instruction_index, instruction in enumerate(instructions):
+            op_code: PRPOpCode = instruction.op_code
+            data = instruction.op_data
+            op_codes[instruction_index] = op_code.value
+
+            if op_code in PRPSharedLevel.LENGTH_OP_CODES:
+                values[instruction_index] = data['length']
+            elif op_code in PRPSharedLevel.INTEGER_OP_CODES or op_code in PRPSharedLevel.BOOL_OP_CODES:
+                values[instruction_index] = int(data)
+            elif op_code in PRPSharedLevel.CHAR_OP_CODES:
+                values[instruction_index] = ord(data)
+            elif op_code in PRPSharedLevel.FLOAT_OP_CODES:
+                floats[instruction_index] = data[0]
+            elif op_code in PRPSharedLevel.STRING_OP_CODES or op_code in PRPSharedLevel.STRING_OR_ARRAY_OP_CODES:
+                values[instruction_index] = intern(data['data']) if isinstance(data, dict) else data
+            elif op_code == PRPOpCode.StringArray:
+                if isinstance(data, list):
+                    values[instruction_index] = len(data)
+                    heap += array('i', [intern(x) for x in data]).tobytes()
+                else:
+                    values[instruction_index] = data
+            elif op_code in PRPSharedLevel.RAW_DATA_OP_CODES:
+                values[instruction_index] = data['length']
+                heap += data['data']
+
+            offsets.append(len(heap))
+
+        string_offsets: array = array('q', [0])
+        string_heap: bytearray = bytearray()
+        for string in strings_index:
+            string_heap += string.encode("ascii")
+            string_offsets.append(len(string_heap))
+
+        metadata: bytes = json.dumps({
+            'is_raw': prp_reader.is_raw,
+            'flags': prp_reader.flags,
+            'unk0x13': prp_reader.unk0x13,
+            'keys_count': prp_reader.keys_count,
+            'objects_count': prp_reader.objects_count,
+            'symbols': prp_reader.symbols,
+            'definitions': [x.__dict__() for x in prp_reader.definitions]
+        }).encode("ascii")
+
+        header: bytes = struct.pack(PRPSharedLevel.HEADER_FORMAT, PRPSharedLevel.MAGIC, len(instructions), len(strings_index),
+                                    len(heap), len(string_heap), len(metadata))
+        sections: [bytes] = [header, values, floats, offsets, string_offsets, op_codes, heap, string_heap, metadata]
+        block_size: int = sum(PRPSharedLevel._aligned(len(memoryview(x).cast('B'))) for x in sections)
+
+        block: shared_memory.SharedMemory = shared_memory.SharedMemory(name, create=True, size=max(block_size, 1))
+        try:
+            position: int = 0
+            for section in sections:
+                section_bytes: memoryview = memoryview(section).cast('B')
+                block.buf[position:position + len(section_bytes)] = section_bytes
+                position += PRPSharedLevel._aligned(len(section_bytes))
+        except BaseException:
+            block.close()
+            block.unlink()
+            raise
+
+        return PRPSharedLevel(block, True)
+
+    @staticmethod
+    def attach(name: str):
+        """
+        Attaches to level published by another process, nothing is copied
+        """
+        # Block belongs to publisher: resource tracker of this process should not destroy it on exit
+        if PRPSharedLevel.IS_TRACK_SUPPORTED:
+            return PRPSharedLevel(shared_memory.SharedMemory(name, track=False), False)
+
+        block: shared_memory.SharedMemory = shared_memory.SharedMemory(name)
+        if os.name == 'posix':
+            # Before Python 3.13 every attached block is registered in tracker (under name with leading slash)
+            resource_tracker.unregister(f"/{block.name}", "shared_memory")
+        return PRPSharedLevel(block, False)
+
+    def close(self):
+        """
+        Releases view of this process (views returned by payload() should be released before), block stays alive
+        """
+        if self._block is None:
+            return
+
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._block.close()
+        self._block = None
+
+    def unlink(self):
+        """
+        Destroys block (only publisher could do it), processes which are still attached keep their views
+        """
+        if not self._is_owner:
+            raise RuntimeError("Only process which published level could unlink it")
+        if self._owned_block is None:
+            return
+
+        if not PRPSharedLevel.IS_TRACK_SUPPORTED and os.name == 'posix':
+            # Before Python 3.13 attached processes could unregister block in tracker shared with publisher
+            resource_tracker.register(f"/{self._owned_block.name}", "shared_memory")
+        self._owned_block.unlink()
+        self._owned_block = None
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def is_raw(self) -> bool:
+        return self._metadata['is_raw']
+
+    @property
+    def flags(self) -> int:
+        return self._metadata['flags']
+
+    @property
+    def unk0x13(self) -> int:
+        return self._metadata['unk0x13']
+
+    @property
+    def keys_count(self) -> int:
+        return self._metadata['keys_count']
+
+    @property
+    def objects_count(self) -> int:
+        return self._metadata['objects_count']
+
+    @property
+    def symbols(self) -> [str]:
+        return self._metadata['symbols']
+
+    @property
+    def definitions(self) -> [PRPDefinition]:
+        return self._definitions
+
+    @property
+    def op_codes(self) -> memoryview:
+        """
+        Column of op-code bytes
+        """
+        self._check_open()
+        return self._op_codes
+
+    @property
+    def values(self) -> memoryview:
+        """
+        Column of integers: value of Int/Bool/Bitfield, code of Char, length of Array/Container/RawData/StringArray,
+        index in string table for strings
+        """
+        self._check_open()
+        return self._values
+
+    @property
+    def floats(self) -> memoryview:
+        """
+        Column of values of Float32/Float64
+        """
+        self._check_open()
+        return self._floats
+
+    @property
+    def instructions(self) -> [PRPInstruction]:
+        """
+        All instructions, built from columns on first access (every process gets its own copy)
+        """
+        if self._instructions is None:
+            self._instructions = list(self.iter_instructions())
+        return self._instructions
+
+    def __len__(self) -> int:
+        self._check_open()
+        return len(self._op_codes)
+
+    def iter_instructions(self, start: int = 0, stop: Optional[int] = None) -> Iterator[PRPInstruction]:
+        """
+        Yields instructions one by one without keeping them in memory
+        """
+        for instruction_index in range(start, len(self) if stop is None else stop):
+            yield self.instruction_at(instruction_index)
+
+    def instruction_at(self, instruction_index: int) -> PRPInstruction:
+        self._check_open()
+        op_code: PRPOpCode = PRPSharedLevel.OP_CODES_BY_BYTE[self._op_codes[instruction_index]]
+        value: int = self._values[instruction_index]
+
+        if op_code in PRPSharedLevel.LENGTH_OP_CODES:
+            return PRPInstruction(op_code, {'length': value})
+        if op_code in PRPSharedLevel.INTEGER_OP_CODES:
+            return PRPInstruction(op_code, value)
+        if op_code in PRPSharedLevel.BOOL_OP_CODES:
+            return PRPInstruction(op_code, bool(value))
+        if op_code in PRPSharedLevel.CHAR_OP_CODES:
+            return PRPInstruction(op_code, chr(value))
+        if op_code in PRPSharedLevel.FLOAT_OP_CODES:
+            return PRPInstruction(op_code, (self._floats[instruction_index],))
+        if op_code in PRPSharedLevel.STRING_OP_CODES or (op_code in PRPSharedLevel.STRING_OR_ARRAY_OP_CODES and (self.flags >> 2) & 1):
+            string: str = self.string_at(value)
+            return PRPInstruction(op_code, {'length': len(string), 'data': string})
+        if op_code == PRPOpCode.StringArray and (self.flags >> 2) & 1:
+            payload: memoryview = self._heap[self._offsets[instruction_index]:self._offsets[instruction_index + 1]]
+            return PRPInstruction(op_code, [self.string_at(x) for x in payload.cast('i')])
+        if op_code in PRPSharedLevel.STRING_OR_ARRAY_OP_CODES or op_code == PRPOpCode.StringArray:
+            return PRPInstruction(op_code, value)
+        if op_code in PRPSharedLevel.RAW_DATA_OP_CODES:
+            # Empty payload is decoded by PRPByteCode as empty list
+            return PRPInstruction(op_code, {'length': value, 'data': bytes(self.payload(instruction_index)) if value > 0 else []})
+        return PRPInstruction(op_code)
+
+    def payload(self, instruction_index: int) -> memoryview:
+        """
+        Read-only view of RawData bytes (or int32 string indices of StringArray) of instruction
+        """
+        self._check_open()
+        return self._heap[self._offsets[instruction_index]:self._offsets[instruction_index + 1]]
+
+    def string_at(self, string_index: int) -> str:
+        string: Optional[str] = self._strings[string_index]
+        if string is None:
+            self._check_open()
+            string = str(self._string_heap[self._string_offsets[string_index]:self._string_offsets[string_index + 1]], "ascii")
+            self._strings[string_index] = string
+        return string
+
+    def _check_open(self):
+        if self._block is None:
+            raise RuntimeError(f"Shared level {self._name} is closed, attach() it again to read columns")
+
+    @staticmethod
+    def _aligned(size: int) -> int:
+        return (size + PRPSharedLevel.ALIGNMENT - 1) // PRPSharedLevel.ALIGNMENT * PRPSharedLevel.ALIGNMENT
+
+    def _map_columns(self):
+        magic, instructions_count, strings_count, heap_size, string_heap_size, metadata_size = \
+            struct.unpack_from(PRPSharedLevel.HEADER_FORMAT, self._block.buf)
+        if magic != PRPSharedLevel.MAGIC:
+            self._block.close()
+            raise ValueError(f"Shared memory block {self._name} does not contain published level")
+
+        buffer: memoryview = self._block.buf.toreadonly()
+        self._views.append(buffer)
+
+        position: int = PRPSharedLevel._aligned(struct.calcsize(PRPSharedLevel.HEADER_FORMAT))
+
+        def section(size: int, view_format: str = 'B') -> memoryview:
+            nonlocal position
+            view: memoryview = buffer[position:position + size]
+            self._views.append(view)
+            position += PRPSharedLevel._aligned(size)
+            if view_format != 'B':
+                view = view.cast(view_format)
+                self._views.append(view)
+            return view
+
+        self._values: memoryview = section(8 * instructions_count, 'q')
+        self._floats: memoryview = section(8 * instructions_count, 'd')
+        self._offsets: memoryview = section(8 * (instructions_count + 1), 'q')
+        self._string_offsets: memoryview = section(8 * (strings_count + 1), 'q')
+        self._op_codes: memoryview = section(instructions_count)
+        self._heap: memoryview = section(heap_size)
+        self._string_heap: memoryview = section(string_heap_size)
+        self._metadata: dict = json.loads(bytes(section(metadata_size)))
+        self._definitions: [PRPDefinition] = [PRPDefinition.from_json(x) for x in self._metadata['definitions']]
+        self._strings = [None] * strings_count
@@ -0,0 +1,52 @@
+from PRP import PRPBadInstructionError
+import struct
+
+
+class PRPStringCodec:
+    """
+    Codec of inline (non-indexed) strings, used when bit 3 of PRP flags is not set.
+    Inline string is stored as Int32 length (trailing zero is not counted), ASCII contents and trailing zero byte.
+    StringOrArray op-codes store string without trailing zero.
+    """
+
+    @staticmethod
+    def decode(buffer: memoryview, offset: int, is_terminated: bool = True) -> (str, int):
+        """
+        Decodes inline string which starts at offset, returns string and offset right after it
+        """
+        if offset + 4 > len(buffer):
+            raise PRPBadInstructionError(f"Unexpected end of data at {offset}, expected inline string")
+
+        (length,) = struct.unpack_from('<i', buffer, offset)
+        begin: int = offset + 4
+        end: int = begin + length
+        if length < 0 or end > len(buffer):
+            raise PRPBadInstructionError(f"Got bad inline string at {offset} (length is {length})")
+
+        if not is_terminated:
+            return str(buffer[begin:end], "ascii"), end
+
+        if end >= len(buffer) or not buffer[end] == 0:
+            raise PRPBadInstructionError(f"Inline string at {offset} is not terminated")
+
+        return str(buffer[begin:end], "ascii"), end + 1
+
+    @staticmethod
+    def read_from(stream) -> str:
+        """
+        Reads inline string from binary stream
+        """
+        length: int = int.from_bytes(stream.read(0x4), "little", signed=True)
+        if length < 0:
+            raise PRPBadInstructionError(f"Got bad inline string (length is {length})")
+
+        raw: bytes = stream.read(length)
+        if not stream.read(0x1) == b"\x00":
+            raise PRPBadInstructionError(f"Inline string '{bytes(raw)}' is not terminated")
+
+        return str(raw, "ascii")
+
+    @staticmethod
+    def encode(value: str, is_terminated: bool = True) -> bytes:
+        raw: bytes = value.encode("ascii")
+        return struct.pack('<i', len(raw)) + raw + (b"\x00" if is_terminated else b"")
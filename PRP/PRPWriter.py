@@ -1,39 +1,179 @@
-from PRP import PRPDefinition, PRPDefinitionType, PRPInstruction, PRPOpCode
+from PRP import PRPDefinition, PRPDefinitionType, PRPInstruction, PRPOpCode, PRPShapeCache
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, BinaryIO
 import struct
+import io
+import os
 
 
 class PRPWriter:
-    def __init__(self, out_path: str):
-        self._prp_out_path: str = out_path
+    # Instructions of this count or more are encoded in process pool (0 - never, CLI enables it explicitly)
+    PARALLEL_THRESHOLD: int = 0
+    PARALLEL_CHUNKS_PER_WORKER: int = 4
+
+    def __init__(self, out_path: Optional[str] = None, shape_cache: Optional[PRPShapeCache] = None,
+                 parallel_threshold: Optional[int] = None, max_workers: Optional[int] = None):
+        self._prp_out_path: Optional[str] = out_path
         self._prp_symbols_table: [str] = []
+        self._prp_symbols_index: {str: int} = {}
+        self._prp_shape_cache: PRPShapeCache = shape_cache if shape_cache is not None else PRPShapeCache()
+        self._prp_parallel_threshold: int = parallel_threshold if parallel_threshold is not None else PRPWriter.PARALLEL_THRESHOLD
+        self._prp_max_workers: int = max_workers if max_workers is not None else (os.cpu_count() or 1)
 
-    def write(self, prp_flags: int, prp_definitions: [PRPDefinition], prp_instructions: [PRPInstruction], is_raw: bool = False, unk0x13: int = 0):
-        self._index_symbols_table(prp_definitions, prp_instructions)
+    @property
+    def shape_cache(self) -> PRPShapeCache:
+        return self._prp_shape_cache
 
+    def write(self, prp_flags: int, prp_definitions: [PRPDefinition], prp_instructions: [PRPInstruction], is_raw: bool = False, unk0x13: int = 0):
         with open(self._prp_out_path, "wb") as prp_file:
-            header_size: int = 0x1F
-            symbols_table: bytes = self._generate_symbols_table()
-            data_offset: int = header_size + len(symbols_table) - 0x1F
-            header: bytes = self._generate_header(prp_flags, data_offset, is_raw, unk0x13)
-            prp_file.write(header)
-            prp_file.write(symbols_table)
-            prp_file.write(struct.pack('<i', len([x for x in prp_instructions if x.op_code == PRPOpCode.BeginObject])))  # Write count of objects
-
-            # Write ZDefs
-            prp_file.write(struct.pack('<ci', PRPOpCode.Container.value.to_bytes(1, "little"), len(prp_definitions)))
-            prp_def: PRPDefinition
-            for prp_def in prp_definitions:
-                prp_file.write(prp_def.to_bytes(prp_flags, self._prp_symbols_table))
-
-            # Write instructions
-            prp_instruction: PRPInstruction
-            for prp_instruction in prp_instructions:
-                prp_file.write(prp_instruction.to_bytes(prp_flags, self._prp_symbols_table))
-
-    def _index_symbols_table(self, prp_definitions: [PRPDefinition], prp_instructions: [PRPInstruction]):
+            self.write_to(prp_file, prp_flags, prp_definitions, prp_instructions, is_raw, unk0x13)
+
+    def to_bytes(self, prp_flags: int, prp_definitions: [PRPDefinition], prp_instructions: [PRPInstruction], is_raw: bool = False, unk0x13: int = 0) -> bytes:
+        """
+        Returns contents of PRP without touching disk
+        """
+        prp_buffer: io.BytesIO = io.BytesIO()
+        self.write_to(prp_buffer, prp_flags, prp_definitions, prp_instructions, is_raw, unk0x13)
+        return prp_buffer.getvalue()
+
+    def write_to(self, prp_file: BinaryIO, prp_flags: int, prp_definitions: [PRPDefinition], prp_instructions: [PRPInstruction], is_raw: bool = False, unk0x13: int = 0):
+        """
+        Writes PRP into any writable binary stream (stdout, pipe, socket, etc.). Stream is never seeked
+        """
+        self._prp_symbols_table = []
+        self._prp_symbols_index = {}
+        self._index_symbols_table(prp_flags, prp_definitions, prp_instructions)
+        # Inline strings (bit 3 of flags is not set) never refer to symbols table
+        instructions_symbols_table: Optional[list] = self._prp_symbols_table if (prp_flags >> 3) & 1 else None
+
+        header_size: int = 0x1F
+        symbols_table: bytes = self._generate_symbols_table()
+        data_offset: int = header_size + len(symbols_table) - 0x1F
+        header: bytes = self._generate_header(prp_flags, data_offset, is_raw, unk0x13)
+        prp_file.write(header)
+        prp_file.write(symbols_table)
+        prp_file.write(struct.pack('<i', len([x for x in prp_instructions if x.op_code == PRPOpCode.BeginObject])))  # Write count of objects
+
+        # Write ZDefs
+        prp_file.write(struct.pack('<ci', PRPOpCode.Container.value.to_bytes(1, "little"), len(prp_definitions)))
+        prp_def: PRPDefinition
+        for prp_def in prp_definitions:
+            prp_file.write(prp_def.to_bytes(prp_flags, self._prp_symbols_table, self._prp_symbols_index))
+
+        # Write instructions. Objects with fixed layout are packed at once by their shape
+        if not self._write_instructions_parallel(prp_file, prp_flags, prp_instructions, instructions_symbols_table):
+            PRPWriter._write_instructions(prp_file, prp_flags, prp_instructions, instructions_symbols_table,
+                                          self._prp_symbols_index, self._prp_shape_cache)
+            self._prp_shape_cache.add_total(len(prp_instructions))
+
+    @staticmethod
+    def _write_instructions(prp_file: BinaryIO, prp_flags: int, prp_instructions: [PRPInstruction], instructions_symbols_table: Optional[list],
+                            symbols_index: {str: int}, shape_cache: PRPShapeCache):
+        prp_instruction: PRPInstruction
+        prp_instruction_index: int = 0
+
+        def encode_member(prp_member: PRPInstruction) -> bytes:
+            return prp_member.to_bytes(prp_flags, instructions_symbols_table, symbols_index)
+
+        while prp_instruction_index < len(prp_instructions):
+            prp_instruction = prp_instructions[prp_instruction_index]
+            if prp_instruction.op_code == PRPOpCode.BeginObject or prp_instruction.op_code == PRPOpCode.BeginNamedObject:
+                prp_object_end: int = PRPWriter._find_end_of_object(prp_instructions, prp_instruction_index)
+                prp_object: Optional[bytes] = shape_cache.encode_object(
+                    prp_instructions[prp_instruction_index:prp_object_end], prp_flags, symbols_index, encode_member)
+                if prp_object is not None:
+                    prp_file.write(prp_object)
+                    prp_instruction_index = prp_object_end
+                    continue
+
+            prp_file.write(prp_instruction.to_bytes(prp_flags, instructions_symbols_table, symbols_index))
+            prp_instruction_index += 1
+
+    def _write_instructions_parallel(self, prp_file: BinaryIO, prp_flags: int, prp_instructions: [PRPInstruction],
+                                     instructions_symbols_table: Optional[list]) -> bool:
+        """
+        Encodes chunks of instructions (split between top-level objects) in process pool and writes them in order.
+        Instructions and symbols table are passed to every worker once, tasks are just ranges of chunks.
+        Returns False when instructions should be encoded sequentially
+        """
+        if self._prp_parallel_threshold <= 0 or len(prp_instructions) < self._prp_parallel_threshold or self._prp_max_workers < 2:
+            return False
+
+        chunks: [(int, int)] = PRPWriter.split_objects(prp_instructions, self._prp_max_workers * PRPWriter.PARALLEL_CHUNKS_PER_WORKER)
+        if len(chunks) < 2:
+            return False
+
+        with ProcessPoolExecutor(max_workers=self._prp_max_workers, initializer=PRPWriter._init_worker,
+                                 initargs=(prp_flags, prp_instructions, instructions_symbols_table, self._prp_symbols_index)) as pool:
+            for chunk_bytes, statistics in pool.map(PRPWriter._encode_chunk, chunks):
+                prp_file.write(chunk_bytes)
+                self._prp_shape_cache.merge(statistics)
+
+        return True
+
+    @staticmethod
+    def split_objects(prp_instructions: [PRPInstruction], chunks_count: int) -> [(int, int)]:
+        """
+        Returns ranges of instructions of (almost) same size, split only between top-level objects
+        """
+        chunk_size: int = max(len(prp_instructions) // max(chunks_count, 1), 1)
+        chunks: [(int, int)] = []
+        chunk_begin: int = 0
+        depth: int = 0
+
+        for prp_instruction_index, prp_instruction in enumerate(prp_instructions):
+            if prp_instruction.op_code == PRPOpCode.BeginObject or prp_instruction.op_code == PRPOpCode.BeginNamedObject:
+                depth += 1
+            elif prp_instruction.op_code == PRPOpCode.EndObject:
+                depth -= 1
+
+            if depth <= 0 and prp_instruction_index + 1 - chunk_begin >= chunk_size:
+                chunks.append((chunk_begin, prp_instruction_index + 1))
+                chunk_begin = prp_instruction_index + 1
+
+        if chunk_begin < len(prp_instructions):
+            chunks.append((chunk_begin, len(prp_instructions)))
+
+        return chunks
+
+    # Instructions shared with worker process of parallel encoder: (flags, instructions, symbols table, symbols index)
+    _worker_state: Optional[tuple] = None
+
+    @staticmethod
+    def _init_worker(prp_flags: int, prp_instructions: [PRPInstruction], instructions_symbols_table: Optional[list], symbols_index: {str: int}):
+        PRPWriter._worker_state = (prp_flags, prp_instructions, instructions_symbols_table, symbols_index)
+
+    @staticmethod
+    def _encode_chunk(chunk: (int, int)) -> tuple:
+        prp_flags, prp_instructions, instructions_symbols_table, symbols_index = PRPWriter._worker_state
+        shape_cache: PRPShapeCache = PRPShapeCache()
+        chunk_instructions: [PRPInstruction] = prp_instructions[chunk[0]:chunk[1]]
+        chunk_file: io.BytesIO = io.BytesIO()
+        PRPWriter._write_instructions(chunk_file, prp_flags, chunk_instructions, instructions_symbols_table, symbols_index, shape_cache)
+        shape_cache.add_total(len(chunk_instructions))
+        return chunk_file.getvalue(), shape_cache.statistics()
+
+    @staticmethod
+    def _find_end_of_object(prp_instructions: [PRPInstruction], begin_index: int) -> int:
+        """
+        Returns index right after EndObject which closes object started at begin_index
+        """
+        depth: int = 0
+        for prp_instruction_index in range(begin_index, len(prp_instructions)):
+            prp_op_code: PRPOpCode = prp_instructions[prp_instruction_index].op_code
+            if prp_op_code == PRPOpCode.BeginObject or prp_op_code == PRPOpCode.BeginNamedObject:
+                depth += 1
+            elif prp_op_code == PRPOpCode.EndObject:
+                depth -= 1
+                if depth == 0:
+                    return prp_instruction_index + 1
+        return len(prp_instructions)
+
+    def _index_symbols_table(self, prp_flags: int, prp_definitions: [PRPDefinition], prp_instructions: [PRPInstruction]):
         symbols_table: [str] = []
         result_symbols_table: [str] = []
 
+        is_indexed_strings: bool = bool((prp_flags >> 3) & 1)
         prp_definition: PRPDefinition
         prp_definition_index: int
 
@@ -42,6 +182,9 @@ class PRPWriter:
             if prp_definition.def_type in [PRPDefinitionType.StringRef_1, PRPDefinitionType.StringRef_2,
                                            PRPDefinitionType.StringRef_3, PRPDefinitionType.StringRefTab]:
                 if prp_definition.def_type == PRPDefinitionType.StringRefTab:
+                    if not is_indexed_strings:
+                        continue
+
                     prp_str: str
                     for prp_str in prp_definition.def_data:
                         symbols_table.append(prp_str)
@@ -51,19 +194,26 @@ class PRPWriter:
         prp_instruction_index: int
         prp_instruction: PRPInstruction
 
-        for prp_instruction_index, prp_instruction in enumerate(prp_instructions):
-            if prp_instruction.op_code in [PRPOpCode.String, PRPOpCode.NamedString, PRPOpCode.StringOrArray_E,
-                                           PRPOpCode.StringOrArray_8E]:
+        for prp_instruction_index, prp_instruction in enumerate(prp_instructions if is_indexed_strings else []):
+            if prp_instruction.op_code in [PRPOpCode.String, PRPOpCode.NamedString]:
                 symbols_table.append(prp_instruction.op_data['data'])
-            elif prp_instruction.op_code == PRPOpCode.StringArray:
+            elif prp_instruction.op_code in [PRPOpCode.StringOrArray_E, PRPOpCode.StringOrArray_8E] and (prp_flags >> 2) & 1:
+                symbols_table.append(prp_instruction.op_data['data'])
+            elif prp_instruction.op_code == PRPOpCode.StringArray and (prp_flags >> 2) & 1:
                 symbol_str: str
                 for symbol_str in prp_instruction.op_data:
                     symbols_table.append(symbol_str)
 
         for symbol_str in symbols_table:
-            if symbol_str not in self._prp_symbols_table:
+            if symbol_str not in self._prp_symbols_index:
+                self._prp_symbols_index[symbol_str] = len(self._prp_symbols_table)
                 self._prp_symbols_table.append(symbol_str)
 
+        # Header counts only non-empty symbols, but readers expect one more (empty) entry in table
+        if '' not in self._prp_symbols_index:
+            self._prp_symbols_index[''] = len(self._prp_symbols_table)
+            self._prp_symbols_table.append('')
+
     def _generate_header(self, flags: int, data_offset: int, is_raw: bool = False, unk0x13: int = 0) -> bytes:
         hdr: bytes = bytes()
         hdr += b"IOPacked v0.1\x00"
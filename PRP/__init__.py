@@ -1,12 +1,22 @@
 from .PRPOpCode import PRPOpCode
-from .PRPInstruction import PRPInstruction
 from .PRPBadInstructionError import PRPBadInstructionError
+from .PRPStringCodec import PRPStringCodec
+from .PRPBlobStore import PRPBlobStore
+from .PRPInstruction import PRPInstruction
 from .PRPStructureError import PRPStructureError
 from .PRPBadDefinitionError import PRPBadDefinitionError
 from .PRPBadInstructionProcessingError import PRPBadInstructionProcessingError
 from .PRPByteCodeContext import PRPByteCodeContext
+from .PRPByteStream import PRPByteStream
+from .PRPObjectShape import PRPObjectShape
+from .PRPShapeCache import PRPShapeCache
 from .PRPByteCode import PRPByteCode
 from .PRPDefinitionType import PRPDefinitionType
 from .PRPDefinition import PRPDefinition
 from .PRPReader import PRPReader
 from .PRPWriter import PRPWriter
+from .PRPJson import PRPJson
+from .PRPArchive import PRPArchive
+from .PRPPatcher import PRPPatcher
+from .PRPCorpusIndex import PRPCorpusIndex
+from .PRPSharedLevel import PRPSharedLevel
@@ -1,81 +1,723 @@
-from PRP import PRPReader, PRPWriter
+from PRP import PRPReader, PRPWriter, PRPByteStream, PRPArchive, PRPByteCode, PRPShapeCache, PRPPatcher, PRPCorpusIndex, PRPBlobStore, PRPJson
 from PRP import PRPStructureError, PRPBadDefinitionError, PRPBadInstructionError
 from PRP import PRPDefinition, PRPInstruction, PRPDefinitionType, PRPOpCode
 
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from typing import Optional
 from enum import Enum
 import argparse
+import hashlib
 import logging
 import json
+import time
 import sys
+import os
 
 
 class ToolMode(Enum):
     Compile = 'compile'
     Decompile = 'decompile'
+    Watch = 'watch'
+    Verify = 'verify'
+    Info = 'info'
+    Analyze = 'analyze'
 
     def __str__(self):
         return self.value
 
 
-def cli_compile(what: str, result: str):
+STD_STREAM_PATH: str = '-'
+# Bytecode of level takes about 4 bytes per instruction
+BYTES_PER_INSTRUCTION: int = 4
+# Library never starts process pools by itself, tool enables them for levels with bytecode of this size or larger
+DEFAULT_PARALLEL_THRESHOLD: int = 4 * 1024 * 1024
+
+
+def cli_set_parallel_threshold(threshold: int):
+    """
+    Sets size of bytecode (bytes) from which single level is decoded and encoded in process pool, 0 disables it
+    """
+    PRPByteCode.PARALLEL_THRESHOLD = threshold
+    PRPWriter.PARALLEL_THRESHOLD = threshold // BYTES_PER_INSTRUCTION if threshold > 0 else 0
+
+
+def cli_init_worker():
+    # Files are already processed in parallel, so workers should not start pools of their own
+    cli_set_parallel_threshold(0)
+
+
+def cli_read_json(what: str):
+    if what == STD_STREAM_PATH:
+        return json.load(sys.stdin)
+
     with open(what, "r") as source_file:
-        json_data = json.load(source_file)
-        if 'is_raw' in json_data and 'flags' in json_data and 'definitions' in json_data and 'properties' in json_data:
-            prp_is_raw: bool = json_data['is_raw']
-            prp_flags: int = json_data['flags']
-            prp_definitions: [PRPDefinition] = []
-            prp_properties: [PRPInstruction] = []
-            prp_unk0x13 = 0
-
-            for json_definition in json_data['definitions']:
-                prp_definitions.append(PRPDefinition.from_json(json_definition))
-
-            for json_property in json_data['properties']:
-                prp_properties.append(PRPInstruction.from_json(json_property))
-
-            prp_writer: PRPWriter = PRPWriter(result)
-            prp_writer.write(prp_flags, prp_definitions, prp_properties, prp_is_raw, prp_unk0x13)
-            logging.info(f"PRP file {what} was compiled to file {result} successfully!")
+        return json.load(source_file)
+
+
+def cli_load_json(what: str, json_data=None, blob_store: Optional[PRPBlobStore] = None) -> Optional[tuple]:
+    """
+    Loads JSON representation of PRP, returns (flags, definitions, instructions, is_raw, unk0x13) or None when JSON is invalid
+    """
+    try:
+        if json_data is None:
+            json_data = cli_read_json(what)
+    except json.JSONDecodeError as json_error:
+        logging.error(f"Failed to read file {what} because it's not valid JSON. Reason: {json_error}")
+        return None
+
+    try:
+        prp_data: Optional[tuple] = PRPJson.to_prp(json_data, blob_store)
+    except FileNotFoundError as blob_error:
+        logging.error(f"Failed to prepare file {what} because blob is missing. Reason: {blob_error}")
+        return None
+    except ValueError as blob_error:
+        logging.error(f"Failed to prepare file {what} because blob store (--blobs) is required or blob is broken. Reason: {blob_error}")
+        return None
+
+    if prp_data is None:
+        logging.error(f"Failed to prepare file {what} because it's invalid JSON representation of PRP")
+    return prp_data
+
+
+def cli_compile(what: str, result: str, blob_store: Optional[PRPBlobStore] = None) -> bool:
+    if os.path.isdir(what) and PRPArchive.is_archive(result):
+        return cli_compile_archive(what, result, blob_store)
+
+    try:
+        json_data = cli_read_json(what)
+    except json.JSONDecodeError as json_error:
+        logging.error(f"Failed to read file {what} because it's not valid JSON. Reason: {json_error}")
+        return False
+
+    if 'objects' in json_data:
+        return cli_splice(what, json_data, result, blob_store)
+
+    prp_data: Optional[tuple] = cli_load_json(what, json_data, blob_store)
+    if prp_data is None:
+        return False
+
+    prp_archive_member: Optional[tuple] = PRPArchive.split_path(result)
+
+    if result == STD_STREAM_PATH:
+        PRPWriter().write_to(sys.stdout.buffer, *prp_data)
+        sys.stdout.buffer.flush()
+    elif prp_archive_member is not None:
+        archive_path, member_name = prp_archive_member
+        PRPArchive.replace_members(archive_path, {member_name: PRPWriter().to_bytes(*prp_data)})
+    else:
+        # Write next to the destination and swap it in, so nobody ever sees a half-written PRP
+        tmp_path: str = f"{result}.{os.getpid()}.tmp"
+        try:
+            prp_writer: PRPWriter = PRPWriter(tmp_path)
+            prp_writer.write(*prp_data)
+            os.replace(tmp_path, result)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    logging.info(f"PRP file {what} was compiled to file {result} successfully!")
+    return True
+
+
+def cli_parse_ranges(what: str) -> [range]:
+    """
+    Parses list of object indices like '0-10,15' (ranges are inclusive)
+    """
+    index_ranges: [range] = []
+    for entry in what.split(','):
+        bounds: [str] = entry.strip().split('-')
+        if len(bounds) == 1:
+            index_ranges.append(range(int(bounds[0]), int(bounds[0]) + 1))
+        elif len(bounds) == 2:
+            index_ranges.append(range(int(bounds[0]), int(bounds[1]) + 1))
         else:
-            logging.error(f"Failed to prepare file {what} because it's invalid JSON representation of PRP")
+            raise argparse.ArgumentTypeError(f"Bad range of objects: {entry}")
+    return index_ranges
 
 
-def cli_decompile(what: str, result: str):
-    prp_reader: PRPReader = PRPReader(what)
+def cli_export(what: str, result: str, index_ranges: Optional[list], string_value: Optional[str],
+               blob_store: Optional[PRPBlobStore] = None) -> bool:
+    """
+    Decompiles only selected top-level objects, every object is tagged by its position in PRP to be spliced back by compile
+    """
+    if what == STD_STREAM_PATH or PRPArchive.split_path(what) is not None or PRPArchive.is_archive(what):
+        logging.error(f"Objects could be selected only from PRP file, but got {what}")
+        return False
+
     try:
-        prp_reader.parse()
+        prp_patcher: PRPPatcher = PRPPatcher(what)
+        prp_patcher.load()
 
-        with open(result, "w") as result_file:
-            result_file.write(json.dumps({
-                'is_raw': prp_reader.is_raw,
-                'flags': prp_reader.flags,
-                'definitions': [x.__dict__() for x in prp_reader.definitions],
-                'properties': [x.__dict__() for x in prp_reader.instructions]
-            }, indent=4, sort_keys=False))
-
-        logging.info(f"PRP file {what} was decompiled to file {result} successfully!")
+        json_objects: [dict] = []
+        for object_index in prp_patcher.select(index_ranges, string_value):
+            offset, size, instruction_index = prp_patcher.object_at(object_index)
+            json_objects.append({
+                'index': object_index,
+                'offset': offset,
+                'size': size,
+                'instruction': instruction_index,
+                'digest': prp_patcher.digest_of(offset, size),
+                'properties': [x.__dict__(blob_store) for x in prp_patcher.decode_object(object_index)]
+            })
     except PRPStructureError as structure_error:
         logging.error(f"Bad structure of PRP file {what}. Reason: {structure_error}")
+        return False
     except PRPBadDefinitionError as definition_error:
         logging.error(f"Bad z-def structure of PRP file {what}. Reason: {definition_error}")
+        return False
+
+    json_result: str = json.dumps({
+        'flags': prp_patcher.reader.flags,
+        'objects': json_objects
+    }, indent=4, sort_keys=False)
+
+    if result == STD_STREAM_PATH:
+        sys.stdout.write(json_result)
+        sys.stdout.flush()
+    else:
+        with open(result, "w") as result_file:
+            result_file.write(json_result)
+
+    logging.info(f"{len(json_objects)} objects of PRP file {what} were decompiled to file {result} successfully!")
+    return True
+
 
+def cli_splice(what: str, json_data, result: str, blob_store: Optional[PRPBlobStore] = None) -> bool:
+    """
+    Puts objects exported by partial decompile back into their places of PRP, other bytes of PRP stay same
+    """
+    if not os.path.isfile(result):
+        logging.error(f"Objects of {what} could be spliced only into existing PRP file, but got {result}")
+        return False
+
+    try:
+        prp_patcher: PRPPatcher = PRPPatcher(result)
+        prp_patcher.load()
+        if not prp_patcher.reader.flags == json_data['flags']:
+            logging.error(f"Objects of {what} were exported from PRP with another flags")
+            return False
+
+        patches: [tuple] = [(x['offset'], x['size'], x['digest'], [PRPInstruction.from_json(y, blob_store) for y in x['properties']])
+                            for x in json_data['objects']]
+        prp_contents: bytes = prp_patcher.splice(patches)
+    except PRPStructureError as structure_error:
+        logging.error(f"Failed to splice objects of {what} into {result}. Reason: {structure_error}")
+        return False
+    except FileNotFoundError as blob_error:
+        logging.error(f"Failed to splice objects of {what} into {result} because blob is missing. Reason: {blob_error}")
+        return False
+    except ValueError as blob_error:
+        logging.error(f"Failed to splice objects of {what} into {result} because blob store (--blobs) is required or blob is broken. "
+                      f"Reason: {blob_error}")
+        return False
+
+    tmp_path: str = f"{result}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as prp_file:
+            prp_file.write(prp_contents)
+        os.replace(tmp_path, result)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    logging.info(f"{len(patches)} objects of {what} were spliced into PRP file {result} successfully!")
+    return True
+
+
+def cli_compile_archive(what: str, result: str, blob_store: Optional[PRPBlobStore] = None) -> bool:
+    """
+    Compiles JSON files from folder into PRP members of archive with same relative paths (LEVEL.JSON -> LEVEL.PRP).
+    Archive is rewritten once, members without JSON stay untouched.
+    """
+    prp_members: {str: bytes} = {}
+    for member_name in PRPArchive.list_prps(result):
+        json_path: Optional[str] = PRPArchive.folder_path(what, f"{os.path.splitext(member_name)[0]}.JSON")
+        if json_path is None:
+            logging.warning(f"Member {member_name} of archive {result} points outside of {what}, it's skipped")
+            continue
+        if not os.path.isfile(json_path):
+            continue
+
+        prp_data: Optional[tuple] = cli_load_json(json_path, blob_store=blob_store)
+        if prp_data is None:
+            return False
+
+        prp_members[member_name] = PRPWriter().to_bytes(*prp_data)
+
+    if len(prp_members) == 0:
+        logging.warning(f"No JSON files in {what} match PRP files in archive {result}")
+        return False
+
+    PRPArchive.replace_members(result, prp_members)
+    logging.info(f"{len(prp_members)} PRP files from {what} were compiled into archive {result} successfully!")
+    return True
+
+
+def cli_decompile(what: str, result: str, buffer_size: int = PRPByteStream.DEFAULT_BUFFER_SIZE, blob_store: Optional[PRPBlobStore] = None) -> bool:
+    if PRPArchive.is_archive(what):
+        return cli_decompile_archive(what, result, buffer_size, blob_store)
+
+    prp_source = nullcontext(None)
+    if what == STD_STREAM_PATH:
+        prp_source = nullcontext(sys.stdin.buffer)
+    elif PRPArchive.split_path(what) is not None:
+        prp_source = PRPArchive.open_member(what)
+
+    with prp_source as prp_stream:
+        prp_reader: PRPReader
+        if prp_stream is not None:
+            prp_reader = PRPReader.from_stream(prp_stream, buffer_size)
+        else:
+            prp_reader = PRPReader(what)
+
+        try:
+            prp_reader.parse()
+
+            json_result: str = json.dumps(PRPJson.from_reader(prp_reader, blob_store), indent=4, sort_keys=False)
+
+            if result == STD_STREAM_PATH:
+                sys.stdout.write(json_result)
+                sys.stdout.flush()
+            else:
+                with open(result, "w") as result_file:
+                    result_file.write(json_result)
+
+            logging.info(f"PRP file {what} was decompiled to file {result} successfully!")
+            return True
+        except PRPStructureError as structure_error:
+            logging.error(f"Bad structure of PRP file {what}. Reason: {structure_error}")
+        except PRPBadDefinitionError as definition_error:
+            logging.error(f"Bad z-def structure of PRP file {what}. Reason: {definition_error}")
+        return False
+
+
+def cli_decompile_archive(what: str, result: str, buffer_size: int = PRPByteStream.DEFAULT_BUFFER_SIZE,
+                          blob_store: Optional[PRPBlobStore] = None) -> bool:
+    """
+    Decompiles every PRP inside of archive into folder, keeping relative paths (LEVEL.PRP -> LEVEL.JSON).
+    Returns False when any of members failed (others are decompiled anyway)
+    """
+    is_ok: bool = True
+    for member_name in PRPArchive.list_prps(what):
+        json_path: Optional[str] = PRPArchive.folder_path(result, f"{os.path.splitext(member_name)[0]}.JSON")
+        if json_path is None:
+            logging.error(f"Member {member_name} of archive {what} points outside of {result}, it's not decompiled")
+            is_ok = False
+            continue
+        os.makedirs(os.path.dirname(json_path) or '.', exist_ok=True)
+        is_ok = cli_decompile(f"{what}:{member_name}", json_path, buffer_size, blob_store) and is_ok
+    return is_ok
+
+
+def cli_watch_collect(what: str, result: str) -> {str: str}:
+    """
+    Returns map of watched JSON file -> PRP file which should be produced from it
+    """
+    if not os.path.isdir(what):
+        if os.path.isdir(result):
+            return {what: os.path.join(result, f"{os.path.splitext(os.path.basename(what))[0]}.PRP")}
+        return {what: result}
+
+    sources: {str: str} = {}
+    with os.scandir(what) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.lower().endswith(".json"):
+                sources[entry.path] = os.path.join(result, f"{os.path.splitext(entry.name)[0]}.PRP")
+    return sources
+
+
+def cli_watch_build(what: str, result: str, blob_store: Optional[PRPBlobStore] = None) -> (bool, float):
+    build_start: float = time.perf_counter()
+    try:
+        is_ok: bool = cli_compile(what, result, blob_store)
+    except Exception as build_error:
+        logging.error(f"Failed to compile {what}. Reason: {build_error}")
+        is_ok = False
+    return is_ok, time.perf_counter() - build_start
+
+
+def cli_watch_record(what: str, signature: (int, int), is_ok: bool, elapsed: float, built: {str: (int, int)}, failed: {str: (int, int)}):
+    if is_ok:
+        logging.info(f"Build of {what} finished in {elapsed * 1000.0:.1f} ms")
+        built[what] = signature
+        failed.pop(what, None)
+    else:
+        logging.info(f"Build of {what} FAILED in {elapsed * 1000.0:.1f} ms, it will be retried when source changes")
+        failed[what] = signature
+
+
+def cli_watch(what: str, result: str, interval: float, debounce: float, jobs: int, blob_store: Optional[PRPBlobStore] = None):
+    if os.path.isdir(what):
+        os.makedirs(result, exist_ok=True)
+
+    # Signature of each source as it was at the moment of last successful build: (mtime_ns, size)
+    built: {str: (int, int)} = {}
+    # Signature of each source at the moment of its failed build, it's built again only when source changes
+    # (touch source to retry when cause was fixed outside of it, like missing blob)
+    failed: {str: (int, int)} = {}
+    # Signature of each changed source and the moment when we saw it first
+    pending: {str: ((int, int), float)} = {}
+    pool: Optional[ProcessPoolExecutor] = None
+
+    # Sources which already have up to date PRP are not rebuilt on start
+    for source_path, destination_path in cli_watch_collect(what, result).items():
+        try:
+            source_stat = os.stat(source_path)
+            if os.stat(destination_path).st_mtime_ns >= source_stat.st_mtime_ns:
+                built[source_path] = (source_stat.st_mtime_ns, source_stat.st_size)
+        except OSError:
+            pass
+
+    logging.info(f"Watching {what} (poll every {interval}s, debounce {debounce}s). Press Ctrl+C to stop")
+
+    try:
+        while True:
+            now: float = time.monotonic()
+            ready: {str: (str, (int, int))} = {}
+
+            for source_path, destination_path in cli_watch_collect(what, result).items():
+                try:
+                    source_stat = os.stat(source_path)
+                except OSError:
+                    continue  # Removed or not yet written
+
+                signature: (int, int) = (source_stat.st_mtime_ns, source_stat.st_size)
+                if built.get(source_path) == signature or failed.get(source_path) == signature:
+                    pending.pop(source_path, None)
+                elif source_path not in pending or pending[source_path][0] != signature:
+                    # File is still being saved, wait until it settles down
+                    pending[source_path] = (signature, now)
+                elif now - pending[source_path][1] >= debounce:
+                    ready[source_path] = (destination_path, signature)
+
+            if len(ready) == 1 or (len(ready) > 1 and jobs == 1):
+                for source_path, (destination_path, signature) in ready.items():
+                    is_ok, elapsed = cli_watch_build(source_path, destination_path, blob_store)
+                    cli_watch_record(source_path, signature, is_ok, elapsed, built, failed)
+            elif len(ready) > 1:
+                if pool is None:
+                    pool = ProcessPoolExecutor(max_workers=jobs if jobs > 0 else None, initializer=cli_init_worker)
+
+                batch_start: float = time.perf_counter()
+                futures = {source_path: pool.submit(cli_watch_build, source_path, destination_path, blob_store)
+                           for source_path, (destination_path, _) in ready.items()}
+                for source_path, future in futures.items():
+                    is_ok, elapsed = future.result()
+                    cli_watch_record(source_path, ready[source_path][1], is_ok, elapsed, built, failed)
+                logging.info(f"Rebuilt {len(ready)} files in {(time.perf_counter() - batch_start) * 1000.0:.1f} ms")
+
+            for source_path in ready:
+                pending.pop(source_path, None)
+
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        logging.info("Watch stopped")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+def cli_collect_prps(what: str) -> [str]:
+    """
+    Returns PRP file itself or all PRP files inside of folder (recursively)
+    """
+    if not os.path.isdir(what):
+        return [what]
+
+    prp_paths: [str] = []
+    for root, _, file_names in os.walk(what):
+        for file_name in file_names:
+            if file_name.lower().endswith(".prp"):
+                prp_paths.append(os.path.join(root, file_name))
+    return sorted(prp_paths)
+
+
+def cli_verify_locate(prp_reader: PRPReader, original: bytes, offset: int) -> str:
+    """
+    Describes place of PRP file where offset points to
+    """
+    if offset < 0x1F:
+        return "header"
+    if offset < prp_reader.bytecode_offset:
+        return "symbols table or definitions"
+
+    vm_index: int = prp_reader.bytecode_offset
+    instruction_index: int = 0
+    while vm_index < len(original):
+        vm_index += PRPByteCode.op_span(original, vm_index, prp_reader.flags)
+        if offset < vm_index:
+            break
+        instruction_index += 1
+
+    if instruction_index < len(prp_reader.instructions):
+        instruction: PRPInstruction = prp_reader.instructions[instruction_index]
+        return f"instruction #{instruction_index} ({instruction.op_code}, {instruction.op_data})"
+    return f"instruction #{instruction_index} (after end of bytecode)"
+
+
+def cli_verify_compare(prp_reader: PRPReader, original: bytes, rebuilt: bytes) -> Optional[str]:
+    """
+    Returns description of first difference or None when contents are same
+    """
+    if hashlib.sha1(original).digest() == hashlib.sha1(rebuilt).digest():
+        return None
+
+    offset: int = next((i for i, (a, b) in enumerate(zip(original, rebuilt)) if not a == b), min(len(original), len(rebuilt)))
+    return f"first difference at offset {offset:#x} in {cli_verify_locate(prp_reader, original, offset)}, " \
+           f"size {len(original)} -> {len(rebuilt)}"
+
+
+def cli_verify_file(what: str) -> dict:
+    """
+    Checks that PRP -> model -> PRP and PRP -> JSON -> PRP round trips give same bytes
+    """
+    report: dict = {'path': what, 'size': 0, 'errors': [], 'decode': 0.0, 'model': 0.0, 'json': 0.0, 'decode_coverage': 0.0, 'encode_coverage': 0.0}
+    try:
+        with open(what, "rb") as prp_file:
+            original: bytes = prp_file.read()
+        report['size'] = len(original)
+
+        stage_start: float = time.perf_counter()
+        decode_shapes: PRPShapeCache = PRPShapeCache()
+        prp_reader: PRPReader = PRPReader.from_bytes(original)
+        prp_reader.parse(decode_shapes)
+        report['decode'] = time.perf_counter() - stage_start
+        report['decode_coverage'] = decode_shapes.statistics()['coverage']
+
+        stage_start = time.perf_counter()
+        prp_writer: PRPWriter = PRPWriter()
+        rebuilt: bytes = prp_writer.to_bytes(prp_reader.flags, prp_reader.definitions, prp_reader.instructions, prp_reader.is_raw, prp_reader.unk0x13)
+        report['model'] = time.perf_counter() - stage_start
+        report['encode_coverage'] = prp_writer.shape_cache.statistics()['coverage']
+        model_difference: Optional[str] = cli_verify_compare(prp_reader, original, rebuilt)
+        if model_difference is not None:
+            report['errors'].append(f"PRP -> model -> PRP: {model_difference}")
+
+        stage_start = time.perf_counter()
+        rebuilt = PRPJson.compile_bytes(json.dumps(PRPJson.from_reader(prp_reader), indent=4, sort_keys=False))
+        report['json'] = time.perf_counter() - stage_start
+        json_difference: Optional[str] = cli_verify_compare(prp_reader, original, rebuilt)
+        if json_difference is not None:
+            report['errors'].append(f"PRP -> JSON -> PRP: {json_difference}")
+    except Exception as verify_error:
+        report['errors'].append(f"{type(verify_error).__name__}: {verify_error}")
+
+    return report
+
+
+def cli_verify(what: str, jobs: int) -> bool:
+    prp_paths: [str] = cli_collect_prps(what)
+    if len(prp_paths) == 0:
+        logging.error(f"No PRP files found in {what}")
+        return False
+
+    def megabytes_per_second(size: int, elapsed: float) -> float:
+        return size / (1024 * 1024) / elapsed if elapsed > 0 else 0.0
+
+    verify_start: float = time.perf_counter()
+    failed: int = 0
+    total_size: int = 0
+
+    with ProcessPoolExecutor(max_workers=jobs if jobs > 0 else None, initializer=cli_init_worker) as pool:
+        for report in pool.map(cli_verify_file, prp_paths):
+            total_size += report['size']
+            if len(report['errors']) > 0:
+                failed += 1
+                for error in report['errors']:
+                    logging.error(f"FAIL {report['path']}: {error}")
+            else:
+                logging.info(f"OK   {report['path']} ({report['size']} bytes): "
+                             f"decode {megabytes_per_second(report['size'], report['decode']):.2f} MB/s, "
+                             f"compile {megabytes_per_second(report['size'], report['model']):.2f} MB/s, "
+                             f"JSON round trip {megabytes_per_second(report['size'], report['json']):.2f} MB/s, "
+                             f"batched by shapes {report['decode_coverage'] * 100.0:.1f}% / {report['encode_coverage'] * 100.0:.1f}%")
+
+    elapsed: float = time.perf_counter() - verify_start
+    logging.info(f"Verified {len(prp_paths)} files ({total_size} bytes) in {elapsed:.2f} s "
+                 f"({megabytes_per_second(total_size, elapsed):.2f} MB/s): {len(prp_paths) - failed} passed, {failed} failed")
+    return failed == 0
+
+
+def cli_info_collect(what: str) -> [str]:
+    """
+    Returns PRP files of folder (recursively) or members of archive as 'archive.zip:LEVEL.PRP'
+    """
+    if PRPArchive.is_archive(what):
+        return [f"{what}:{member_name}" for member_name in PRPArchive.list_prps(what)]
+    return cli_collect_prps(what)
+
+
+def cli_info_file(what: str, buffer_size: int = PRPByteStream.DEFAULT_BUFFER_SIZE) -> dict:
+    """
+    Reads header, symbols table and definitions of PRP without touching its bytecode
+    """
+    prp_source = nullcontext(None)
+    prp_size: Optional[int] = None
+    if what == STD_STREAM_PATH:
+        prp_source = nullcontext(sys.stdin.buffer)
+    elif PRPArchive.split_path(what) is not None:
+        prp_source = PRPArchive.open_member(what)
+        prp_size = PRPArchive.member_size(what)
+
+    with prp_source as prp_stream:
+        prp_reader: PRPReader
+        if prp_stream is not None:
+            prp_reader = PRPReader.from_stream(prp_stream, buffer_size, prp_size)
+        else:
+            prp_reader = PRPReader(what)
+
+        prp_reader.probe(PRPReader.SECTION_DEFINITIONS)
+
+    definition_types: {str: int} = {}
+    for prp_definition in prp_reader.definitions:
+        definition_types[prp_definition.def_type.name] = definition_types.get(prp_definition.def_type.name, 0) + 1
+
+    return {
+        'path': what,
+        'is_raw': prp_reader.is_raw,
+        'flags': prp_reader.flags,
+        'unk0x13': prp_reader.unk0x13,
+        'keys': prp_reader.keys_count,
+        'symbols': len(prp_reader.symbols),
+        'objects': prp_reader.objects_count,
+        'definitions': len(prp_reader.definitions),
+        'definition_types': definition_types,
+        'sections': prp_reader.section_sizes
+    }
+
+
+def cli_info(what: str, result: Optional[str], buffer_size: int = PRPByteStream.DEFAULT_BUFFER_SIZE) -> bool:
+    """
+    Prints summary of every PRP, full report is written as JSON into result (when it's given)
+    """
+    prp_paths: [str] = [what] if what == STD_STREAM_PATH else cli_info_collect(what)
+    if len(prp_paths) == 0:
+        logging.error(f"No PRP files found in {what}")
+        return False
+
+    info_start: float = time.perf_counter()
+    reports: [dict] = []
+    failed: int = 0
+
+    for prp_path in prp_paths:
+        try:
+            report: dict = cli_info_file(prp_path, buffer_size)
+        except (PRPStructureError, PRPBadDefinitionError, NotImplementedError, IndexError, OSError) as info_error:
+            logging.error(f"Failed to read {prp_path}. Reason: {info_error}")
+            failed += 1
+            continue
+
+        sections: {str: Optional[int]} = report['sections']
+        bytecode_size: str = str(sections['bytecode']) if sections['bytecode'] is not None else 'unknown'
+        logging.info(f"{prp_path}: flags {report['flags']:#x}, raw {report['is_raw']}, {report['keys']} keys, "
+                     f"{report['objects']} objects, {report['definitions']} definitions; "
+                     f"sections (bytes): header {sections['header']}, symbols {sections['symbols']}, "
+                     f"definitions {sections['definitions']}, bytecode {bytecode_size}")
+        reports.append(report)
+
+    if result is not None:
+        json_result: str = json.dumps(reports, indent=4, sort_keys=False)
+        if result == STD_STREAM_PATH:
+            sys.stdout.write(json_result)
+            sys.stdout.flush()
+        else:
+            with open(result, "w") as result_file:
+                result_file.write(json_result)
+
+    logging.info(f"Inspected {len(reports)} files in {(time.perf_counter() - info_start) * 1000.0:.1f} ms, {failed} failed")
+    return failed == 0
+
+
+def cli_analyze_file(what: str, known_sha1: Optional[str] = None) -> (str, Optional[dict], Optional[str]):
+    try:
+        return what, PRPCorpusIndex.analyze_file(what, known_sha1), None
+    except Exception as analyze_error:
+        return what, None, f"{type(analyze_error).__name__}: {analyze_error}"
+
+
+def cli_analyze(what: str, result: str, jobs: int) -> bool:
+    """
+    Refreshes corpus index in result: only new and changed PRP files are analyzed, then aggregates are merged again
+    """
+    prp_paths: [str] = cli_collect_prps(what)
+    if len(prp_paths) == 0:
+        logging.error(f"No PRP files found in {what}")
+        return False
+
+    analyze_start: float = time.perf_counter()
+    corpus_index: PRPCorpusIndex = PRPCorpusIndex(result)
+    corpus_index.load()
+    stale_paths: {str: Optional[str]} = corpus_index.stale_files(prp_paths)
+    analyzed: int = 0
+    failed: int = 0
+
+    if len(stale_paths) > 0:
+        with ProcessPoolExecutor(max_workers=jobs if jobs > 0 else None, initializer=cli_init_worker) as pool:
+            for prp_path, entry, analyze_error in pool.map(cli_analyze_file, stale_paths.keys(), stale_paths.values()):
+                if entry is None:
+                    logging.error(f"FAIL {prp_path}: {analyze_error}")
+                    failed += 1
+                else:
+                    corpus_index.update(prp_path, entry)
+                    analyzed += 1 if entry['partial'] is not None else 0
+
+    corpus: dict = corpus_index.corpus
+    corpus_index.save()
+    logging.info(f"Corpus index {result} refreshed in {time.perf_counter() - analyze_start:.2f} s: "
+                 f"{analyzed} files analyzed, {len(prp_paths) - analyzed - failed} unchanged, {failed} failed; "
+                 f"{corpus['files']} files, {len(corpus['properties'])} property names, {len(corpus['definitions'])} ZDef types")
+    return failed == 0
 
 
 def cli_main():
     cli_parser = argparse.ArgumentParser(description='Compiler or decompile PRP file format from Glacier 1 engine')
-    cli_parser.add_argument('source', help='Source path (PRP or JSON)')
-    cli_parser.add_argument('destination', help='Destination path (PRP or JSON)')
-    cli_parser.add_argument('mode', help='Specify mode: decompile/compile', type=ToolMode, choices=list(ToolMode))
+    cli_parser.add_argument('source', help='Source path (PRP or JSON), use - to read stdin')
+    cli_parser.add_argument('destination', help='Destination path (PRP or JSON), use - to write stdout. Not used by verify, optional JSON report for info, index file for analyze', nargs='?')
+    cli_parser.add_argument('mode', help='Specify mode: decompile/compile/watch/verify/info/analyze', type=ToolMode, choices=list(ToolMode))
+    cli_parser.add_argument('--buffer-size', help='Size of refill buffer when PRP is read from stdin (bytes)', type=int, default=PRPByteStream.DEFAULT_BUFFER_SIZE)
+    cli_parser.add_argument('--interval', help='Watch mode: how often to poll sources (seconds)', type=float, default=0.5)
+    cli_parser.add_argument('--debounce', help='Watch mode: how long source should stay unchanged before build (seconds)', type=float, default=0.3)
+    cli_parser.add_argument('--jobs', help='Watch/verify/analyze mode: max parallel workers (0 - by CPU count)', type=int, default=0)
+    cli_parser.add_argument('--select', help='Decompile mode: decompile only top-level objects with given indices (like 0-10,15)', type=cli_parse_ranges)
+    cli_parser.add_argument('--with-string', help='Decompile mode: decompile only top-level objects which contain given string (property name or value), whole level is scanned')
+    cli_parser.add_argument('--blobs', help='Decompile/compile/watch mode: folder where large RawData payloads are stored by their hashes instead of JSON')
+    cli_parser.add_argument('--blob-threshold', help='Decompile mode: RawData payloads of this size or larger are moved to --blobs folder (bytes)',
+                            type=int, default=PRPBlobStore.DEFAULT_THRESHOLD)
+    cli_parser.add_argument('--parallel-threshold', help='Levels with bytecode of this size or larger are decoded and encoded in parallel (bytes, 0 - never)',
+                            type=int, default=DEFAULT_PARALLEL_THRESHOLD)
     cli_args = cli_parser.parse_args()
+    cli_set_parallel_threshold(cli_args.parallel_threshold)
 
     cli_mode: ToolMode = cli_args.mode
     cli_src: str = cli_args.source
     cli_dst: str = cli_args.destination
 
+    if cli_dst is None and cli_mode not in [ToolMode.Verify, ToolMode.Info]:
+        cli_parser.error(f"destination is required for mode {cli_mode}")
+
+    cli_blob_store: Optional[PRPBlobStore] = PRPBlobStore(cli_args.blobs, cli_args.blob_threshold) if cli_args.blobs is not None else None
+
     if cli_mode == ToolMode.Compile:
-        cli_compile(cli_src, cli_dst)
+        if not cli_compile(cli_src, cli_dst, cli_blob_store):
+            sys.exit(1)
     elif cli_mode == ToolMode.Decompile:
-        cli_decompile(cli_src, cli_dst)
+        if cli_args.select is not None or cli_args.with_string is not None:
+            if not cli_export(cli_src, cli_dst, cli_args.select, cli_args.with_string, cli_blob_store):
+                sys.exit(1)
+        elif not cli_decompile(cli_src, cli_dst, cli_args.buffer_size, cli_blob_store):
+            sys.exit(1)
+    elif cli_mode == ToolMode.Watch:
+        cli_watch(cli_src, cli_dst, cli_args.interval, cli_args.debounce, cli_args.jobs, cli_blob_store)
+    elif cli_mode == ToolMode.Verify:
+        if not cli_verify(cli_src, cli_args.jobs):
+            sys.exit(1)
+    elif cli_mode == ToolMode.Analyze:
+        if not cli_analyze(cli_src, cli_dst, cli_args.jobs):
+            sys.exit(1)
+    elif cli_mode == ToolMode.Info:
+        if not cli_info(cli_src, cli_dst, cli_args.buffer_size):
+            sys.exit(1)
     else:
         raise NotImplementedError("Not implemented mode")
 